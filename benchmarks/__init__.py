@@ -0,0 +1,107 @@
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+__doc__ = """## Benchmarks ##
+
+ Module for measuring the engine, every benchmark case runs in a fresh interpreter so
+ the global storage of one case never skews the next, results are written as JSON
+ so runs of different versions can be compared
+
+    >>> python -m benchmarks --output results.json
+        runs every benchmark, see python -m benchmarks --help for picking cases and sizes
+
+"""
+
+benchmarks = {}
+
+SIZES = (1000, 10000, 100000, 1000000)
+QUICK_SIZES = (1000, 10000)
+
+
+def benchmark(name=None, sized=False):
+    """
+    registers a benchmark, the function is called with a size (None for unsized benchmarks)
+    and returns a dict of measurements
+    :param name: name of the benchmark, defaults to the function name
+    :param sized: the benchmark is run once per size
+    """
+
+    def register(function):
+        benchmarks[name or function.__name__] = (function, sized)
+        return function
+
+    return register
+
+
+def measure(function, repeat=5, number=1):
+    """
+    :param function: callable to time, called number times per repeat
+    :return: dict of the best and median seconds per call
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    return {'best': min(times), 'median': statistics.median(times), 'repeat': repeat, 'number': number}
+
+
+def rate(timing, count):
+    """:return: operations per second of count operations at the best time of a measure() result"""
+    return count / timing['best'] if timing['best'] else float('inf')
+
+
+def load():
+    # importing the case modules registers their benchmarks
+    from benchmarks import benchmarks_core, benchmarks_math, benchmarks_prefabs  # noqa: F401
+    return benchmarks
+
+
+def run_case(name, size=None):
+    """runs one case in this interpreter, :return: its measurements"""
+    function, sized = load()[name]
+    return function(size) if sized else function(None)
+
+
+def run(names=None, sizes=SIZES, timeout=None):
+    """
+    runs benchmark cases, each in its own interpreter
+    :param names: benchmark names to run, every registered benchmark if None
+    :param sizes: sizes sized benchmarks are run at
+    :param timeout: seconds a case may take before it is recorded as timed out
+    :return: dict of the environment and the results of every case
+    """
+    results = []
+    for name in names or sorted(load()):
+        for size in sizes if load()[name][1] else (None,):
+            command = [sys.executable, '-m', 'benchmarks', '--case', name] + ([str(size)] if size else [])
+            result = {'name': name, 'size': size}
+            try:
+                process = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                result['error'] = 'timed out'
+            else:
+                if process.returncode:
+                    result['error'] = process.stderr.strip().splitlines()[-1:] or process.returncode
+                else:
+                    result.update(json.loads(process.stdout))
+            results.append(result)
+            print(f"{name}{f'[{size}]' if size else ''}: {result.get('error', 'done')}", file=sys.stderr)
+    return {'environment': environment(), 'results': results}
+
+
+def environment():
+    import common
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {'eccles': common.__VERSION_STR__, 'python': platform.python_version(),
+            'implementation': platform.python_implementation(), 'platform': platform.platform(),
+            'machine': platform.machine(), 'numpy': numpy_version, 'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
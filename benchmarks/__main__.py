@@ -0,0 +1,41 @@
+import argparse
+import json
+import sys
+
+import benchmarks
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=benchmarks.__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('names', nargs='*', help='benchmarks to run, all of them if none are given')
+    parser.add_argument('-o', '--output', help='file to write the JSON results to, stdout if not given')
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=benchmarks.SIZES,
+                        help='entity counts for sized benchmarks')
+    parser.add_argument('-q', '--quick', action='store_true', help=f'only run sizes {benchmarks.QUICK_SIZES}')
+    parser.add_argument('-t', '--timeout', type=float, help='seconds before a case is given up on')
+    parser.add_argument('-l', '--list', action='store_true', help='list the benchmarks and exit')
+    parser.add_argument('--case', nargs='+', help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+
+    if args.case:
+        name, *size = args.case
+        json.dump(benchmarks.run_case(name, int(size[0]) if size else None), sys.stdout)
+        return
+    if args.list:
+        for name, (_, sized) in sorted(benchmarks.load().items()):
+            print(name, '(sized)' if sized else '')
+        return
+    unknown = set(args.names) - set(benchmarks.load())
+    if unknown:
+        parser.error(f"unknown benchmarks {sorted(unknown)}")
+    results = benchmarks.run(args.names, benchmarks.QUICK_SIZES if args.quick else args.sizes, args.timeout)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
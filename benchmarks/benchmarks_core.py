@@ -0,0 +1,106 @@
+import gc
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks import benchmark, measure, rate
+
+__doc__ = """### Benchmarks Core ###
+
+ script for benchmarks of the ECS core, entity spawn and destroy, component churn,
+ memory per entity and the time it takes to import the engine
+
+ columnar mode costs memory rather than saving it, with Position, Rotation and Velocity
+ an entity takes about 700 bytes as objects and about 950 bytes in columnar mode at 100k entities,
+ the views still carry their component's unused field slots and a row number, and the arrays
+ and their added and changed ticks are allocated up to twice the rows in use
+
+"""
+
+
+def _entities(size):
+    from core import Entity
+    from prefabs import Position, Velocity
+    return [Entity(Position(), Velocity(1., 1., 1.)) for _ in range(size)]
+
+
+@benchmark(sized=True)
+def spawn_destroy(size):
+    spawn, destroy = [], []
+    for _ in range(3):
+        start = time.perf_counter()
+        entities = _entities(size)
+        spawn.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for entity in entities:
+            entity.destroy()
+        destroy.append(time.perf_counter() - start)
+    return {'spawn_per_second': size / min(spawn), 'destroy_per_second': size / min(destroy),
+            'spawn_seconds': min(spawn), 'destroy_seconds': min(destroy)}
+
+
+@benchmark(sized=True)
+def spawn_blueprint(size):
+    from core import Entity
+    from prefabs import DefaultLivingCreatures
+    timing = measure(lambda: Entity.spawn(DefaultLivingCreatures.Player, size), repeat=3)
+    return {'timing': timing, 'spawn_per_second': rate(timing, size)}
+
+
+@benchmark(sized=True)
+def attach_detach(size):
+    from prefabs import Rotation
+    entities = _entities(size)
+    rotations = [Rotation() for _ in entities]
+
+    def churn():
+        for entity, rotation in zip(entities, rotations):
+            entity.attach(rotation)
+        for entity in entities:
+            entity.detach(Rotation)
+
+    timing = measure(churn, repeat=3)
+    return {'timing': timing, 'attach_detach_per_second': rate(timing, size)}
+
+
+def _memory(size, columnar):
+    import prefabs
+    if columnar:
+        prefabs.enable_columnar()
+    from core import Entity
+    components = (prefabs.Position, prefabs.Rotation, prefabs.Velocity)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entities = [Entity(*(component() for component in components)) for _ in range(size)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return {'bytes_per_entity': used / size, 'bytes': used, 'entities': len(entities),
+            'components': [component.__name__ for component in components]}
+
+
+@benchmark(sized=True)
+def memory_per_entity(size):
+    return _memory(size, False)
+
+
+@benchmark(sized=True)
+def memory_per_entity_columnar(size):
+    return _memory(size, True)
+
+
+def _startup(code, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@benchmark()
+def import_time(_):
+    baseline = _startup('pass', 5)
+    return {module: _startup(f'import {module}', 5) - baseline for module in ('common', 'core', 'events', 'prefabs')}
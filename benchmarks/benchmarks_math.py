@@ -0,0 +1,72 @@
+from benchmarks import benchmark, measure, rate
+
+__doc__ = """### Benchmarks Math ###
+
+ script for benchmarks of common.common_math, operations per second of the Vector methods
+ and vectors or transforms per second of the batched VectorArray and common_transforms operations
+
+"""
+
+OPERATIONS = 100000
+
+
+@benchmark()
+def vector(_):
+    from common import Vector
+    a, b = Vector(1., 2., 3.), (3., 2., 1.)
+    operations = {
+        'create': lambda: Vector(1., 2., 3.),
+        'add': lambda: a + b,
+        'multiply': lambda: a * 1.,
+        'magnitude': lambda: a.__len__,
+        'normalize': a.normalize,
+        'dot_product': lambda: a.dot_product(b),
+        'cross_product': lambda: a.cross_product(b),
+        'angle_radians': lambda: a.angle_radians,
+    }
+    return {name: rate(measure(operation, repeat=5, number=OPERATIONS), 1)
+            for name, operation in operations.items()}
+
+
+@benchmark(sized=True)
+def vector_array(size):
+    import numpy as np
+    from common import VectorArray
+    random = np.random.default_rng(0)
+    a, b = VectorArray(random.standard_normal((size, 3))), VectorArray(random.standard_normal((size, 3)))
+    out, lengths = VectorArray(size), np.empty(size)
+    operations = {
+        'add': lambda: a.add(b, out),
+        'scale': lambda: a.scale(2., out),
+        'dot': lambda: a.dot(b, lengths),
+        'cross': lambda: a.cross(b, out),
+        'lengths': lambda: a.lengths(lengths),
+        'normalize': lambda: a.normalize(out),
+        'angle': lambda: a.angle(b, lengths),
+    }
+    repeat = 10 if size <= 100000 else 3
+    return {name: rate(measure(operation, repeat=repeat), size) for name, operation in operations.items()}
+
+
+@benchmark(sized=True)
+def transforms(size):
+    import numpy as np
+    from common import common_transforms as transforms
+    random = np.random.default_rng(0)
+    translations, angles = random.standard_normal((size, 3)), random.uniform(-3., 3., (size, 3))
+    scales, points = random.uniform(.5, 2., (size, 3)), random.standard_normal((size, 3))
+    quaternions, matrices = transforms.quaternions_from_euler(angles), np.empty((size, 4, 4))
+    transforms.compose(translations, quaternions, scales, matrices)
+    quaternion_out, matrix_out, point_out = np.empty((size, 4)), np.empty((size, 4, 4)), np.empty((size, 3))
+    instances = np.empty((size, 16), np.float32)
+    operations = {
+        'quaternions_from_euler': lambda: transforms.quaternions_from_euler(angles, quaternion_out),
+        'quaternion_multiply': lambda: transforms.quaternion_multiply(quaternions, quaternions, quaternion_out),
+        'compose': lambda: transforms.compose(translations, quaternions, scales, matrix_out),
+        'multiply': lambda: transforms.multiply(matrices, matrices, matrix_out),
+        'invert': lambda: transforms.invert(matrices, matrix_out),
+        'transform_points': lambda: transforms.transform_points(matrices, points, point_out),
+        'column_major': lambda: transforms.column_major(matrices, instances),
+    }
+    repeat = 10 if size <= 100000 else 3
+    return {name: rate(measure(operation, repeat=repeat), size) for name, operation in operations.items()}
@@ -0,0 +1,50 @@
+from benchmarks import benchmark, measure, rate
+
+__doc__ = """### Benchmarks Prefabs ###
+
+ script for benchmarks of the prebuilt systems, MotionSystem throughput
+ with components stored as objects and in columnar mode, and particle engine throughput
+
+ measured MotionSystem entities per second, objects against columnar
+    10k entities: 3.2M against 219M, about 70x
+    100k entities: 4.6M against 128M, about 28x
+    1M entities: 4.6M against 71M, about 16x
+ the 50 to 100x that was aimed for only holds for tables that fit in cache, past that the
+ columnar update is bound by memory bandwidth, see memory_per_entity_columnar for its cost in memory
+
+"""
+
+
+def _motion(size, columnar):
+    import prefabs
+    from core import Entity
+    if columnar:
+        prefabs.enable_columnar()
+    system = prefabs.MotionSystem()
+    system.delta_time = 1 / 60
+    entities = [Entity(prefabs.Position(), prefabs.Rotation(), prefabs.Velocity(1., 2., 3.)) for _ in range(size)]
+    timing = measure(system.update, repeat=10 if size <= 100000 else 3)
+    return {'timing': timing, 'entities_per_second': rate(timing, len(entities))}
+
+
+@benchmark(sized=True)
+def motion(size):
+    return _motion(size, False)
+
+
+@benchmark(sized=True)
+def motion_columnar(size):
+    return _motion(size, True)
+
+
+@benchmark(sized=True)
+def particles(size):
+    from prefabs import Curve, ParticleEmitter
+    # a full pool where about a second's worth of particles die and respawn every second
+    emitter = ParticleEmitter(capacity=size, rate=size, lifetime=(.5, 1.5), speed=(1., 3.), spread=1., radius=1.,
+                              gravity=(0., -9.8, 0.), colour=Curve([(0., (255, 255, 255)), (1., (0., 0., 255))]),
+                              opacity=Curve([(0., 1.), (1., 0.)]), seed=0)
+    for _ in range(120):
+        emitter.update(1 / 60)
+    timing = measure(lambda: emitter.update(1 / 60), repeat=10 if size <= 100000 else 3)
+    return {'timing': timing, 'particles_per_second': rate(timing, len(emitter)), 'live': len(emitter)}
@@ -16,3 +16,11 @@ __doc__ = """## Common ##
 """
 
 __doc__ += common_defaults.__doc__ + common_math.__doc__ + common_string_functions.__doc__
+
+
+def __getattr__(name):
+    # names of the common_math submodules, imported on first use
+    if name in common_math._submodules:
+        return getattr(common_math, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
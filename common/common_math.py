@@ -16,6 +16,18 @@ __doc__ = """### Common Math Functions ###
  
 """
 
+# array backed math lives in common_<name> submodules that need NumPy, they are only imported the
+# first time one of their names is used, {exported name: submodule name}
+_submodules = {'VectorArray': 'common_vectors', 'Matrix': 'common_transforms', 'Quaternion': 'common_transforms'}
+
+
+def __getattr__(name):
+    submodule = _submodules.get(name)
+    if submodule is not None:
+        import importlib
+        return getattr(importlib.import_module(f"common.{submodule}"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 class Vector:
 
@@ -139,10 +151,6 @@ class Vector:
         return x, y, z
 
 
-class Matrix:
-    pass
-
-
 class Geometry:
     pass
 
@@ -1,6 +1,3 @@
-import importlib
-import inspect
-
 __doc__ = """### Common String Functions ###
 
  script for string functions that will see regular use
@@ -8,6 +5,8 @@ __doc__ = """### Common String Functions ###
 """
 
 def get_class_docs(_name_: str = __name__, just_names: bool = False):
+    import importlib
+    import inspect
     return {(cls.__doc__ + "\n\r"
              if cls.__doc__
              else ''
@@ -19,4 +18,5 @@ def get_class_docs(_name_: str = __name__, just_names: bool = False):
 
 
 def get_method_docs(obj):
+    import inspect
     return {method for name, method in inspect.getmembers(obj, predicate=inspect.ismethod)}
@@ -0,0 +1,336 @@
+import numpy as np
+
+__doc__ = """### Common Transforms ###
+
+ script for transform math, 4x4 matrices and (x, y, z, w) quaternions, the functions work on whole
+ batches, (n, 4, 4) matrices, (n, 4) quaternions and (n, 3) points, and write into out= buffers when
+ given one so building the transforms of every entity each frame doesn't allocate per entity,
+ Matrix and Quaternion wrap a single transform for everything else
+
+ matrices act on column vectors, a point p is moved to M @ p, rotations from euler angles turn
+ about x, then y, then z (R = Rz @ Ry @ Rx)
+
+"""
+
+
+def _result(out, shape, *inputs):
+    # the array to compute into, a fresh one when out overlaps an input so inputs aren't overwritten mid way
+    if out is None:
+        return np.empty(shape), None
+    if any(np.may_share_memory(out, array) for array in inputs):
+        return np.empty(shape, out.dtype), out
+    return out, None
+
+
+def _finish(result, out):
+    if out is None:
+        return result
+    out[...] = result
+    return out
+
+
+def quaternions_from_euler(angles, out=None):
+    """
+    :param angles: (n, 3) rotations in radians about x, y and z, applied in that order
+    :param out: (n, 4) array to write the quaternions into
+    :return: (n, 4) unit quaternions
+    """
+    half = np.asarray(angles, np.float64) * .5
+    (sx, sy, sz), (cx, cy, cz) = np.sin(half).T, np.cos(half).T
+    out = np.empty((len(half), 4)) if out is None else out
+    out[:, 0] = cz * cy * sx - sz * sy * cx
+    out[:, 1] = cz * sy * cx + sz * cy * sx
+    out[:, 2] = sz * cy * cx - cz * sy * sx
+    out[:, 3] = cz * cy * cx + sz * sy * sx
+    return out
+
+
+def quaternions_from_axis_angle(axes, angles, out=None):
+    """
+    :param axes: (n, 3) axes, normalized here
+    :param angles: (n,) angles in radians
+    :return: (n, 4) unit quaternions
+    """
+    axes = np.asarray(axes, np.float64)
+    half = np.asarray(angles, np.float64) * .5
+    out = np.empty((len(axes), 4)) if out is None else out
+    np.multiply(axes, (np.sin(half) / np.linalg.norm(axes, axis=1))[:, None], out=out[:, :3])
+    np.cos(half, out=out[:, 3])
+    return out
+
+
+def quaternion_multiply(a, b, out=None):
+    """:return: (n, 4) Hamilton products a * b, rotating by b then by a"""
+    a, b = np.asarray(a, np.float64), np.asarray(b, np.float64)
+    ax, ay, az, aw = np.moveaxis(a, -1, 0)
+    bx, by, bz, bw = np.moveaxis(b, -1, 0)
+    result, out = _result(out, np.broadcast_shapes(a.shape, b.shape), a, b)
+    result[..., 0] = aw * bx + ax * bw + ay * bz - az * by
+    result[..., 1] = aw * by - ax * bz + ay * bw + az * bx
+    result[..., 2] = aw * bz + ax * by - ay * bx + az * bw
+    result[..., 3] = aw * bw - ax * bx - ay * by - az * bz
+    return _finish(result, out)
+
+
+def quaternion_normalize(quaternions, out=None):
+    quaternions = np.asarray(quaternions, np.float64)
+    lengths = np.linalg.norm(quaternions, axis=-1, keepdims=True)
+    return np.divide(quaternions, np.maximum(lengths, np.finfo(np.float64).tiny), out=out)
+
+
+def quaternion_rotate(quaternions, vectors, out=None):
+    """:return: (n, 3) vectors rotated by unit quaternions, one quaternion or one per vector"""
+    quaternions, vectors = np.asarray(quaternions, np.float64), np.asarray(vectors, np.float64)
+    axes, w = quaternions[..., :3], quaternions[..., 3:]
+    # v + w t + u x t with t = 2 u x v, two cross products instead of building the matrix
+    twice = 2. * np.cross(axes, vectors)
+    result, out = _result(out, np.broadcast_shapes(vectors.shape, twice.shape), vectors)
+    np.add(vectors, w * twice, out=result)
+    result += np.cross(axes, twice)
+    return _finish(result, out)
+
+
+def quaternion_slerp(a, b, t, out=None):
+    """:return: (n, 4) unit quaternions t of the way from a to b along the shortest arc"""
+    a, b = np.asarray(a, np.float64), np.array(b, np.float64)
+    t = np.asarray(t, np.float64)[..., None]
+    dots = np.sum(a * b, axis=-1, keepdims=True)
+    b *= np.where(dots < 0., -1., 1.)
+    dots = np.abs(dots)
+    # nearly equal rotations are blended linearly, the sine of their angle is too small to divide by
+    close = dots > .9995
+    angles = np.arccos(np.clip(dots, -1., 1.))
+    sines = np.where(close, 1., np.sin(angles))
+    start = np.where(close, 1. - t, np.sin((1. - t) * angles) / sines)
+    end = np.where(close, t, np.sin(t * angles) / sines)
+    return quaternion_normalize(a * start + b * end, out)
+
+
+def rotation_matrices(quaternions, out=None):
+    """:return: (n, 3, 3) rotation matrices of unit quaternions"""
+    quaternions = np.asarray(quaternions, np.float64)
+    out = np.empty(quaternions.shape[:-1] + (3, 3)) if out is None else out
+    _rotation(quaternions, out)
+    return out
+
+
+def _rotation(quaternions, out):
+    x, y, z, w = np.moveaxis(quaternions, -1, 0)
+    xx, yy, zz = x * x, y * y, z * z
+    xy, xz, yz = x * y, x * z, y * z
+    wx, wy, wz = w * x, w * y, w * z
+    out[..., 0, 0] = 1. - 2. * (yy + zz)
+    out[..., 0, 1] = 2. * (xy - wz)
+    out[..., 0, 2] = 2. * (xz + wy)
+    out[..., 1, 0] = 2. * (xy + wz)
+    out[..., 1, 1] = 1. - 2. * (xx + zz)
+    out[..., 1, 2] = 2. * (yz - wx)
+    out[..., 2, 0] = 2. * (xz - wy)
+    out[..., 2, 1] = 2. * (yz + wx)
+    out[..., 2, 2] = 1. - 2. * (xx + yy)
+
+
+def compose(translations, rotations=None, scales=None, out=None):
+    """
+    builds T @ R @ S matrices, scaling first, then rotating, then translating
+    :param translations: (n, 3) translations
+    :param rotations: (n, 4) unit quaternions, None for no rotation
+    :param scales: (n, 3) scale factors, None for no scaling
+    :param out: (n, 4, 4) array to write the matrices into, any float dtype
+    :return: (n, 4, 4) matrices
+    """
+    translations = np.asarray(translations, np.float64)
+    count = len(translations)
+    out = np.empty((count, 4, 4)) if out is None else out
+    linear = out[:, :3, :3]
+    if rotations is None:
+        linear[...] = np.identity(3)
+    else:
+        _rotation(np.asarray(rotations, np.float64), linear)
+    if scales is not None:
+        linear *= np.asarray(scales, np.float64)[:, None, :]
+    out[:, :3, 3] = translations
+    out[:, 3, :3] = 0.
+    out[:, 3, 3] = 1.
+    return out
+
+
+def multiply(a, b, out=None):
+    """:return: (n, 4, 4) products a @ b, b is applied first, either side can be a single (4, 4) matrix"""
+    a, b = np.asarray(a), np.asarray(b)
+    result, out = _result(out, np.broadcast_shapes(a.shape, b.shape), a, b)
+    np.matmul(a, b, out=result)
+    return _finish(result, out)
+
+
+def invert(matrices, out=None, affine=True):
+    """
+    :param matrices: (n, 4, 4) matrices
+    :param affine: the bottom rows are (0, 0, 0, 1), like every matrix made by compose, which only needs
+        the 3x3 part inverted, False inverts any invertible matrix
+    :return: (n, 4, 4) inverses
+    """
+    matrices = np.asarray(matrices)
+    if not affine:
+        return _finish(np.linalg.inv(matrices), out)
+    result, out = _result(out, matrices.shape, matrices)
+    # the columns of a 3x3 inverse are the cross products of the rows over the determinant
+    rows = matrices[..., :3, :3]
+    inverse = np.stack((np.cross(rows[..., 1, :], rows[..., 2, :]), np.cross(rows[..., 2, :], rows[..., 0, :]),
+                        np.cross(rows[..., 0, :], rows[..., 1, :])), axis=-1)
+    inverse /= np.einsum('...j,...j->...', rows[..., 0, :], inverse[..., :, 0])[..., None, None]
+    result[..., :3, :3] = inverse
+    result[..., :3, 3] = -np.einsum('...ij,...j->...i', inverse, matrices[..., :3, 3])
+    result[..., 3, :3] = 0.
+    result[..., 3, 3] = 1.
+    return _finish(result, out)
+
+
+def transform_points(matrices, points, out=None):
+    """:return: (n, 3) points moved by one (4, 4) matrix or one matrix per point"""
+    matrices, points = np.asarray(matrices), np.asarray(points, np.float64)
+    result, out = _result(out, points.shape, points)
+    np.einsum('...ij,...j->...i', matrices[..., :3, :3], points, out=result)
+    result += matrices[..., :3, 3]
+    return _finish(result, out)
+
+
+def transform_vectors(matrices, vectors, out=None):
+    """:return: (n, 3) directions turned and scaled by the matrices, translation is ignored"""
+    matrices, vectors = np.asarray(matrices), np.asarray(vectors, np.float64)
+    result, out = _result(out, vectors.shape, vectors)
+    np.einsum('...ij,...j->...i', matrices[..., :3, :3], vectors, out=result)
+    return _finish(result, out)
+
+
+def column_major(matrices, out=None, dtype=np.float32):
+    """:return: (n, 16) rows of the matrices in column major order, the layout OpenGL expects"""
+    matrices = np.asarray(matrices)
+    out = np.empty((len(matrices), 16), dtype) if out is None else out
+    out.reshape(-1, 4, 4)[...] = matrices.transpose(0, 2, 1)
+    return out
+
+
+class Quaternion:
+    """### Quaternion ###
+
+  a single rotation stored as an (x, y, z, w) array
+
+    >>> Quaternion(x, y, z, w)
+        defaults to no rotation
+    >>> Quaternion.from_euler(x, y, z) / Quaternion.from_axis_angle(axis, angle)
+    >>> a * b
+        rotates by b then by a
+    >>> rotate(vectors, out)
+        rotates one (x, y, z) or an (n, 3) batch
+    >>> conjugate() / normalized() / matrix() / slerp(other, t)
+
+    """
+    __slots__ = ('array',)
+
+    def __init__(self, x=0., y=0., z=0., w=1.):
+        self.array = np.array((x, y, z, w), np.float64)
+
+    @classmethod
+    def from_array(cls, array):
+        return cls(*np.asarray(array, np.float64))
+
+    @classmethod
+    def from_euler(cls, x=0., y=0., z=0.):
+        return cls.from_array(quaternions_from_euler([(x, y, z)])[0])
+
+    @classmethod
+    def from_axis_angle(cls, axis, angle):
+        return cls.from_array(quaternions_from_axis_angle([axis], [angle])[0])
+
+    def get(self):
+        return tuple(self.array.tolist())
+
+    def __mul__(self, other):
+        return Quaternion.from_array(quaternion_multiply(self.array, other.array))
+
+    def conjugate(self):
+        x, y, z, w = self.get()
+        return Quaternion(-x, -y, -z, w)
+
+    def normalized(self):
+        return Quaternion.from_array(quaternion_normalize(self.array))
+
+    def rotate(self, vectors, out=None):
+        return quaternion_rotate(self.array, vectors, out)
+
+    def matrix(self):
+        return Matrix.compose((0., 0., 0.), self)
+
+    def slerp(self, other, t):
+        return Quaternion.from_array(quaternion_slerp(self.array, other.array, t))
+
+    def __eq__(self, other):
+        return isinstance(other, Quaternion) and bool(np.array_equal(self.array, other.array))
+
+    def __str__(self):
+        x, y, z, w = self.get()
+        return f"{self.__class__.__name__}(x={x}, y={y}, z={z}, w={w})"
+
+
+class Matrix:
+    """### Matrix ###
+
+  a single 4x4 transform
+
+    >>> Matrix(array)
+        defaults to the identity
+    >>> Matrix.translation(x, y, z) / Matrix.scaling(x, y, z) / Matrix.rotation(quaternion)
+    >>> Matrix.compose(translation, rotation, scale)
+        translation and scale are (x, y, z), rotation is a Quaternion
+    >>> a @ b
+        applies b then a
+    >>> inverse(affine)
+    >>> transform_points(points, out) / transform_vectors(vectors, out)
+        moves one (x, y, z) or an (n, 3) batch
+    >>> column_major()
+        the 16 float32 values in the order OpenGL expects
+
+    """
+    __slots__ = ('array',)
+
+    def __init__(self, array=None):
+        self.array = np.identity(4) if array is None else np.array(array, np.float64).reshape(4, 4)
+
+    @classmethod
+    def translation(cls, x=0., y=0., z=0.):
+        return cls.compose((x, y, z))
+
+    @classmethod
+    def scaling(cls, x=1., y=1., z=1.):
+        return cls.compose((0., 0., 0.), scale=(x, y, z))
+
+    @classmethod
+    def rotation(cls, quaternion):
+        return cls.compose((0., 0., 0.), quaternion)
+
+    @classmethod
+    def compose(cls, translation, rotation=None, scale=None):
+        return cls(compose([translation], None if rotation is None else [rotation.array],
+                           None if scale is None else [scale])[0])
+
+    def __matmul__(self, other):
+        return Matrix(self.array @ other.array)
+
+    def inverse(self, affine=True):
+        return Matrix(invert(self.array[None], affine=affine)[0])
+
+    def transform_points(self, points, out=None):
+        return transform_points(self.array, points, out)
+
+    def transform_vectors(self, vectors, out=None):
+        return transform_vectors(self.array, vectors, out)
+
+    def column_major(self):
+        return column_major(self.array[None])[0]
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix) and bool(np.array_equal(self.array, other.array))
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.array.tolist()})"
@@ -0,0 +1,191 @@
+import numpy as np
+
+from common.common_math import Vector
+
+__doc__ = """### Common Vectors ###
+
+ script for batched vector math, a VectorArray holds n 3d vectors in one contiguous (n, 3) array
+ and every operation works on all of them at once, results can be written into an existing
+ VectorArray or array with out= so hot loops don't allocate
+
+"""
+
+
+def _array(value):
+    # the (n, 3) or (3,) float array behind any operand, integer tuples and arrays are cast
+    if isinstance(value, VectorArray):
+        return value.array
+    if isinstance(value, Vector):
+        return np.array(value.get(), np.float64)
+    value = np.asarray(value)
+    return value if np.issubdtype(value.dtype, np.floating) else value.astype(np.float64)
+
+
+class VectorArray:
+    """### VectorArray ###
+
+  n vectors in a contiguous (n, 3) array, operands are VectorArrays, (n, 3) arrays, or one Vector or
+  (x, y, z) applied to every row, scale factors are a number or one per row
+
+    >>> VectorArray(vectors, dtype)
+        vectors = a count of zero vectors, an iterable of Vectors or (x, y, z), or an (n, 3) array
+    >>> VectorArray.wrap(array)
+        uses an existing (n, 3) float array without copying, like an ArrayColumn's array,
+        integer arrays are copied to float64
+    >>> add(other, out) / subtract(other, out) / scale(factors, out) / cross(other, out) / normalize(out)
+        return a VectorArray, out = a VectorArray or (n, 3) array to write into, out=self works in place
+    >>> dot(other, out) / lengths(out) / angle(other, out)
+        return (n,) arrays, angles in radians, out = (n,) array to write into
+    >>> a + b, a - b, a * factors, -a
+        allocate a new VectorArray, a += b, a -= b and a *= factors work in place
+
+    """
+    __slots__ = ('array', '_scratch')
+
+    def __init__(self, vectors=0, dtype=np.float64):
+        if isinstance(vectors, int):
+            array = np.zeros((vectors, 3), dtype)
+        elif isinstance(vectors, np.ndarray):
+            array = np.array(vectors, dtype).reshape(-1, 3)
+        else:
+            array = np.array([v.get() if isinstance(v, Vector) else v for v in vectors], dtype).reshape(-1, 3)
+        self.array = array
+        self._scratch = None
+
+    @classmethod
+    def wrap(cls, array):
+        if array.ndim != 2 or array.shape[1] != 3:
+            raise ValueError(f"expected an (n, 3) array, got shape {array.shape}")
+        if not np.issubdtype(array.dtype, np.floating):
+            array = array.astype(np.float64)
+        return cls._view(array)
+
+    @classmethod
+    def _view(cls, array):
+        vectors = cls.__new__(cls)
+        vectors.array = array
+        vectors._scratch = None
+        return vectors
+
+    def _out(self, out):
+        # out arrays are written to as given, never copied, so a wrong dtype fails instead of being lost
+        if out is None:
+            return VectorArray._view(np.empty_like(self.array))
+        return out if isinstance(out, VectorArray) else VectorArray._view(out)
+
+    def _rows(self, count):
+        # (count,) float buffer reused between calls
+        scratch = self._scratch
+        if scratch is None or len(scratch) < count:
+            scratch = self._scratch = np.empty(count, self.array.dtype)
+        return scratch[:count]
+
+    def add(self, other, out=None):
+        out = self._out(out)
+        np.add(self.array, _array(other), out=out.array)
+        return out
+
+    def subtract(self, other, out=None):
+        out = self._out(out)
+        np.subtract(self.array, _array(other), out=out.array)
+        return out
+
+    def scale(self, factors, out=None):
+        out = self._out(out)
+        factors = np.asarray(factors)
+        np.multiply(self.array, factors[:, None] if factors.ndim == 1 else factors, out=out.array)
+        return out
+
+    def dot(self, other, out=None):
+        other = _array(other)
+        if other.ndim == 1:
+            return np.dot(self.array, other, out=out)
+        return np.einsum('ij,ij->i', self.array, other, out=out)
+
+    def lengths(self, out=None):
+        out = np.einsum('ij,ij->i', self.array, self.array, out=out)
+        return np.sqrt(out, out=out)
+
+    def normalize(self, out=None):
+        # zero vectors stay zero instead of dividing by zero
+        lengths = self.lengths(self._rows(len(self)))
+        np.maximum(lengths, np.finfo(lengths.dtype).tiny, out=lengths)
+        out = self._out(out)
+        np.divide(self.array, lengths[:, None], out=out.array)
+        return out
+
+    def cross(self, other, out=None):
+        a, b = self.array, np.broadcast_to(_array(other), self.array.shape)
+        out = self._out(out)
+        result = out.array
+        if np.may_share_memory(result, a) or np.may_share_memory(result, b):
+            result = np.empty_like(a)
+        term = self._rows(len(a))
+        for axis, (i, j) in enumerate(((1, 2), (2, 0), (0, 1))):
+            np.multiply(a[:, i], b[:, j], out=result[:, axis])
+            np.multiply(a[:, j], b[:, i], out=term)
+            result[:, axis] -= term
+        if result is not out.array:
+            out.array[...] = result
+        return out
+
+    def angle(self, other, out=None):
+        """:return: the angle between each pair of vectors in radians, 0 where either vector is zero"""
+        other_lengths = VectorArray.wrap(np.broadcast_to(_array(other), self.array.shape)).lengths()
+        out = self.dot(other, out)
+        lengths = self.lengths(self._rows(len(self)))
+        lengths *= other_lengths
+        np.divide(out, np.maximum(lengths, np.finfo(lengths.dtype).tiny), out=out)
+        np.clip(out, -1., 1., out=out)
+        out = np.arccos(out, out=out)
+        out[lengths == 0] = 0.
+        return out
+
+    def copy(self):
+        return VectorArray.wrap(self.array.copy())
+
+    def vector(self, index):
+        return Vector(*self.array[index].tolist())
+
+    def __add__(self, other):
+        return self.add(other)
+
+    def __sub__(self, other):
+        return self.subtract(other)
+
+    def __mul__(self, factors):
+        return self.scale(factors)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return VectorArray.wrap(np.negative(self.array))
+
+    def __iadd__(self, other):
+        return self.add(other, self)
+
+    def __isub__(self, other):
+        return self.subtract(other, self)
+
+    def __imul__(self, factors):
+        return self.scale(factors, self)
+
+    def __array__(self, dtype=None):
+        return self.array if dtype is None else self.array.astype(dtype)
+
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        return (self.vector(index) for index in range(len(self)))
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.array[index]
+        return VectorArray.wrap(self.array[index])
+
+    def __setitem__(self, index, value):
+        self.array[index] = _array(value)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(dtype={self.array.dtype})[vectors={len(self)}]"
@@ -1,2 +1,14 @@
-from core.core_objects import Entity, Component, System, CoreException
-__all__ = ['Entity', 'Component', 'System', 'CoreException']
+from core.core_clock import Clock
+from core.core_commands import CommandBuffer
+from core.core_entities import EntityAllocator
+from core.core_history import History, Delta
+from core.core_objects import Entity, Component, System, CoreException, docs
+from core.core_query import Query, QueryView
+from core.core_registry import ComponentRegistry
+from core.core_scheduler import Scheduler
+from core.core_storage import Archetype, ArchetypeStorage, Column
+from core.core_timers import TimerWheel
+from core.core_trace import Tracer
+__all__ = ['Entity', 'Component', 'System', 'CoreException', 'Archetype', 'ArchetypeStorage', 'Column', 'Query',
+           'QueryView', 'Scheduler', 'EntityAllocator', 'CommandBuffer', 'Clock', 'Tracer', 'History', 'Delta',
+           'ComponentRegistry', 'TimerWheel', 'docs']
@@ -0,0 +1,111 @@
+import time
+
+__doc__ = """### Core Clock ###
+
+ script for the clock hierarchy, a root clock reads a monotonic timer and drives child
+ clocks that each tick at their own rate, tick n of a clock always falls at n / rate
+ after the clock started so rates never drift, however late the clocks are advanced
+
+"""
+
+
+class Clock:
+    """### Clock ###
+
+  a clock that ticks at a fixed rate, driven by its parent, the root clock (no parent) is driven by a timer
+
+    >>> Clock(rate, parent, max_catch_up, timer)
+        rate = ticks per second, None for a clock that only passes time on to its children
+        parent = the clock driving this one, None for the root
+        max_catch_up = the most ticks run in one advance, older ticks are skipped and counted as dropped
+        timer = monotonic timer used by the root clock
+
+    >>> child(rate, max_catch_up)
+        creates a clock driven by this one
+    >>> subscribe(callback)
+        callback(delta_time) is called for every tick
+    >>> advance()
+        root only, reads the timer and returns every tick due across the hierarchy as
+        (time, clock) pairs in time order, call tick() on each to notify the subscribers
+    >>> next_tick()
+        seconds of clock time until the next tick anywhere in the hierarchy
+
+  exposes time (seconds since the clock started), ticks (ticks run) and dropped (ticks skipped)
+
+    """
+
+    def __init__(self, rate=None, parent=None, max_catch_up=5, timer=time.monotonic):
+        self.rate = rate
+        self.period = 1. / rate if rate else 0.
+        self.parent = parent
+        self.max_catch_up = max_catch_up
+        self.timer = parent.timer if parent is not None else timer
+        self.children = []
+        self.subscribers = []
+        self.origin = None
+        self.time = 0.
+        self.ticks = 0
+        self.dropped = 0
+        if parent is not None:
+            parent.children.append(self)
+            # a clock added to a running hierarchy starts counting from the parent's current time
+            self.time = parent.time
+            self.ticks = self._due(parent.time)
+
+    def child(self, rate, max_catch_up=None):
+        return Clock(rate, self, self.max_catch_up if max_catch_up is None else max_catch_up)
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def _due(self, parent_time):
+        # index of the last tick at or before parent_time, the epsilon keeps exact multiples on time
+        return int(parent_time * self.rate + 1e-9) if self.rate else 0
+
+    def _collect(self, parent_time, due):
+        if not self.rate:
+            self.time = parent_time
+            for clock in self.children:
+                clock._collect(parent_time, due)
+            return
+        behind = self._due(parent_time) - self.ticks
+        if behind > self.max_catch_up:
+            self.dropped += behind - self.max_catch_up
+            self.ticks += behind - self.max_catch_up
+            behind = self.max_catch_up
+        for _ in range(behind):
+            self.ticks += 1
+            self.time = self.ticks * self.period
+            due.append((self.time, self))
+            for clock in self.children:
+                clock._collect(self.time, due)
+
+    def advance(self):
+        now = self.timer()
+        if self.origin is None:
+            self.origin = now
+        due = []
+        self._collect(now - self.origin, due)
+        due.sort(key=lambda tick: tick[0])
+        return due
+
+    def tick(self):
+        for callback in tuple(self.subscribers):
+            callback(self.period)
+
+    def next_tick(self):
+        elapsed = (self.timer() - self.origin) if self.origin is not None else 0.
+        return max(min(self._next_times(), default=elapsed) - elapsed, 0.)
+
+    def _next_times(self):
+        if self.rate:
+            yield (self.ticks + 1) * self.period
+        for clock in self.children:
+            yield from clock._next_times()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(rate={self.rate}, children={len(self.children)})" \
+               f"[time={self.time:.6f}, ticks={self.ticks}, dropped={self.dropped}]"
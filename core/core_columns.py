@@ -0,0 +1,216 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+__doc__ = """### Core Columns ###
+
+ script for numeric columns, components stored in an ArrayColumn keep their fields in a
+ single NumPy array and the component objects handed out are lightweight views into it,
+ so systems can work on a whole column in one vectorized operation
+
+"""
+
+_view_types = {}
+
+
+def _field(index):
+    def getter(self):
+        return self._column.values.item(self._row, index)
+
+    def setter(self, value):
+        self._column.values[self._row, index] = value
+
+    return property(getter, setter)
+
+
+def view_type(component_type, fields):
+    """
+    :param component_type: component type to build a view of
+    :param fields: names of the numeric fields of the component
+    :return: subclass of component_type whose fields read and write a row of an ArrayColumn
+    """
+    key = (component_type, tuple(fields))
+    if key not in _view_types:
+        namespace = {name: _field(index) for index, name in enumerate(fields)}
+        namespace.update({
+            '__slots__': ('_column', '_row'),
+            '__qualname__': component_type.__qualname__,
+            'view_of': component_type,
+            'get_value': lambda self: tuple(self._column.values[self._row].tolist()),
+            'set_value': _set_row,
+        })
+        _view_types[key] = type(component_type.__name__, (component_type,), namespace)
+    return _view_types[key]
+
+
+def _set_row(self, *values):
+    self._column.values[self._row] = values[0] if len(values) == 1 else values
+
+
+class ArrayColumn:
+    """### ArrayColumn ###
+
+  column that stores the numeric fields of one component type as rows of a (capacity, fields) array,
+  a drop in replacement for Column that hands out views instead of the original component objects
+
+    >>> ArrayColumn(component_type, fields, dtype, capacity)
+        component_type = the component type stored in this column
+        fields = names of the numeric fields, in array column order
+        dtype = NumPy dtype of the array, float64 by default
+        capacity = starting number of rows, the array doubles when full
+
+    >>> array
+        (rows, fields) array of the live rows, writes go straight to the components
+    >>> allocate(shape, dtype)
+        creates the backing array, override to place the data somewhere else
+    >>> as_rows(values, count)
+        values as a (count, fields) array of the column's dtype, values is anything np.asarray takes
+    >>> extend(rows, tick)
+        adds rows from a (rows, fields) array or a list of components, returns the views of the new rows
+    >>> load(values, entity_ids, tick)
+        replaces every row with a (rows, fields) array, the array is adopted without copying when
+        adopt(values) allows it, so a memory mapped array stays mapped
+
+  added and changed ticks are kept in int64 arrays, so vectorized systems can mark
+  whole columns, or a mask of rows, as changed with mark_all_changed(tick, rows)
+
+    """
+    __slots__ = ('component_type', 'fields', 'dtype', 'values', 'views', 'view_type', 'added', 'changed')
+
+    def __init__(self, component_type, fields, dtype=np.float64, capacity=64):
+        self.component_type = component_type
+        self.fields = tuple(fields)
+        self.dtype = np.dtype(dtype)
+        self.values = self.allocate((capacity, len(self.fields)), self.dtype)
+        self.added = np.zeros(capacity, np.int64)
+        self.changed = np.zeros(capacity, np.int64)
+        self.views = []
+        self.view_type = view_type(component_type, self.fields)
+
+    def allocate(self, shape, dtype):
+        return np.zeros(shape, dtype)
+
+    @property
+    def array(self):
+        return self.values[:len(self.views)]
+
+    def __len__(self):
+        return len(self.views)
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def _grow(self, minimum=0):
+        capacity, rows = max(len(self.values) * 2, minimum, 1), len(self.views)
+        values = self.allocate((capacity, len(self.fields)), self.dtype)
+        values[:rows] = self.array
+        self.values = values
+        self.added = np.concatenate((self.added[:rows], np.zeros(capacity - rows, np.int64)))
+        self.changed = np.concatenate((self.changed[:rows], np.zeros(capacity - rows, np.int64)))
+
+    def as_rows(self, values, count):
+        return np.asarray(values, self.dtype).reshape(count, len(self.fields))
+
+    def adopt(self, values):
+        """:return: values as the backing array of the column, copied only if the dtype differs"""
+        return values if values.dtype == self.dtype else values.astype(self.dtype)
+
+    def load(self, values, entity_ids, tick=0):
+        for view in self.views:
+            self._release(view)
+        self.values = self.adopt(values)
+        rows = len(entity_ids)
+        self.added = np.full(len(self.values), tick, np.int64)
+        self.changed = self.added.copy()
+        view_type = self.view_type
+        views = self.views = [view_type.__new__(view_type) for _ in range(rows)]
+        for row, (view, entity_id) in enumerate(zip(views, entity_ids)):
+            view._column, view._row, view.entity_id = self, row, entity_id
+        return views
+
+    def _bind(self, component, row):
+        # moves the values of component into row and returns the view that now owns that row
+        values = [getattr(component, name) for name in self.fields]
+        self.values[row] = values
+        if type(component) is self.view_type:
+            view = component
+        else:
+            view = self.view_type.__new__(self.view_type)
+            view.entity_id = component.entity_id
+        view._column, view._row = self, row
+        return view
+
+    def _release(self, view):
+        # a view removed from the column keeps a private copy of its values
+        if view._column is self:
+            view._column = SimpleNamespace(values=self.values[view._row:view._row + 1].copy())
+            view._row = 0
+
+    def append(self, component, added=0, changed=0):
+        row = len(self.views)
+        if row == len(self.values):
+            self._grow()
+        view = self._bind(component, row)
+        self.views.append(view)
+        self.added[row], self.changed[row] = added, changed
+        return view
+
+    def extend(self, rows, tick=0):
+        if not isinstance(rows, np.ndarray):
+            return [self.append(component, tick, tick) for component in rows]
+        start, end = len(self.views), len(self.views) + len(rows)
+        if end > len(self.values):
+            self._grow(end)
+        self.values[start:end] = rows
+        self.added[start:end] = self.changed[start:end] = tick
+        view_type = self.view_type
+        views = [view_type.__new__(view_type) for _ in range(len(rows))]
+        for row, view in enumerate(views, start):
+            view._column, view._row = self, row
+        self.views.extend(views)
+        return views
+
+    def get(self, row):
+        return self.views[row]
+
+    def set(self, row, component, tick=0):
+        self.added[row] = self.changed[row] = tick
+        old = self.views[row]
+        if component is old:
+            return old
+        self._release(old)
+        view = self.views[row] = self._bind(component, row)
+        return view
+
+    def swap_remove(self, row):
+        views = self.views
+        self._release(views[row])
+        last = views.pop()
+        if row < len(views):
+            end = len(views)
+            self.values[row] = self.values[end]
+            self.added[row], self.changed[row] = self.added[end], self.changed[end]
+            views[row] = last
+            last._row = row
+
+    def ticks(self, row):
+        return int(self.added[row]), int(self.changed[row])
+
+    def mark_changed(self, row, tick):
+        self.changed[row] = tick
+
+    def mark_all_changed(self, tick, rows=None):
+        changed = self.changed[:len(self.views)]
+        if rows is None:
+            changed[:] = tick
+        else:
+            changed[rows] = tick
+
+    def changed_since(self, tick):
+        return np.flatnonzero(self.changed[:len(self.views)] > tick)
+
+    def added_since(self, tick):
+        return np.flatnonzero(self.added[:len(self.views)] > tick)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.component_type.__name__}, {self.fields}, {self.dtype})[rows={len(self)}]"
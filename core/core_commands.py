@@ -0,0 +1,93 @@
+from threading import Lock
+
+__doc__ = """### Core Commands ###
+
+ script for deferring structural changes, systems record spawns, destroys, attaches and detaches
+ while they iterate and the recorded changes are applied in one pass at a sync point, so tables
+ never change size under an iterating system and each entity moves tables at most once per pass
+
+"""
+
+
+class CommandBuffer:
+    """### CommandBuffer ###
+
+  records structural changes to be applied later, safe to record into from several systems at once
+
+    >>> CommandBuffer(allocator, entity_type)
+        allocator = the EntityAllocator ids are reserved from
+        entity_type = the Entity class used to apply the changes
+
+    >>> spawn(*_components)
+        reserves an entity id straight away, the entity exists once the buffer is applied
+    >>> destroy(entity_id)
+    >>> attach(entity_id, *_components)
+    >>> detach(entity_id, *_components)
+        _components are component types or components
+    >>> apply()
+        applies every recorded change in recording order, returns the number of entities changed,
+        changes to the same entity are merged so it moves tables at most twice (detaches, then attaches)
+
+    """
+
+    def __init__(self, allocator, entity_type):
+        self.allocator = allocator
+        self.entity_type = entity_type
+        self.commands = []
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.commands)
+
+    def spawn(self, *_components):
+        with self.lock:
+            entity_id = self.allocator.allocate()
+        self.commands.append(('spawn', entity_id, _components))
+        return entity_id
+
+    def destroy(self, entity_id):
+        self.commands.append(('destroy', entity_id, ()))
+
+    def attach(self, entity_id, *_components):
+        self.commands.append(('attach', entity_id, _components))
+
+    def detach(self, entity_id, *_components):
+        self.commands.append(('detach', entity_id, _components))
+
+    def apply(self):
+        with self.lock:
+            commands, self.commands = self.commands, []
+        # {entity_id: [spawned, destroyed, {component type: component}, {detached component types}]}
+        changes = {}
+        for command, entity_id, _components in commands:
+            change = changes.get(entity_id)
+            if change is None:
+                change = changes[entity_id] = [False, False, {}, set()]
+            if command == 'destroy':
+                change[1] = True
+                continue
+            if command == 'spawn':
+                change[0] = True
+            for component in _components:
+                component_type = component if isinstance(component, type) else component.component_type
+                if command == 'detach':
+                    change[2].pop(component_type, None)
+                    change[3].add(component_type)
+                else:
+                    change[2][component_type] = component
+                    change[3].discard(component_type)
+        for entity_id, (spawned, destroyed, attached, detached) in changes.items():
+            if not self.allocator.is_alive(entity_id):
+                continue
+            entity = self.entity_type.from_id(entity_id)
+            if destroyed:
+                entity.destroy()
+                continue
+            if detached:
+                entity.detach(*detached)
+            if attached or spawned:
+                entity.attach(*attached.values())
+        return len(changes)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(commands={len(self)})"
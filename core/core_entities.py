@@ -0,0 +1,102 @@
+__doc__ = """### Core Entities ###
+
+ script for allocating entity ids, ids are a slot index plus a generation so freed slots
+ can be recycled while handles to the entity that used to own the slot are detected as stale
+
+"""
+
+INDEX_BITS = 32
+INDEX_MASK = (1 << INDEX_BITS) - 1
+
+
+def entity_index(entity_id):
+    """:return: the slot index of an entity id"""
+    return entity_id & INDEX_MASK
+
+
+def entity_generation(entity_id):
+    """:return: the generation of an entity id"""
+    return entity_id >> INDEX_BITS
+
+
+class EntityAllocator:
+    """### EntityAllocator ###
+
+  hands out compact entity ids made from (index, generation), freed indexes go on a free list and are
+  handed out again with the generation bumped, so an id is never reused for two different entities
+
+    >>> allocate()
+        returns a new entity id, recycling a freed index when there is one
+    >>> release(entity_id)
+        frees the id, it stops being alive and its index is recycled
+    >>> is_alive(entity_id)
+        check to see if the id belongs to a live entity and not to a destroyed one
+    >>> undo(entry)
+        reverts an entry of the journal, entries must be undone newest first
+
+  while journal is a list every allocate and release is appended to it as
+  ('allocate', entity_id, fresh index) or ('release', entity_id, None)
+
+    """
+    __slots__ = ('generations', 'alive', 'free', 'journal')
+
+    def __init__(self):
+        self.generations = []
+        self.alive = bytearray()
+        self.free = []
+        self.journal = None
+
+    def allocate(self):
+        fresh = not self.free
+        if fresh:
+            index = len(self.generations)
+            self.generations.append(0)
+            self.alive.append(0)
+        else:
+            index = self.free.pop()
+        self.alive[index] = 1
+        entity_id = index | self.generations[index] << INDEX_BITS
+        if self.journal is not None:
+            self.journal.append(('allocate', entity_id, fresh))
+        return entity_id
+
+    def release(self, entity_id):
+        if not self.is_alive(entity_id):
+            return False
+        index = entity_id & INDEX_MASK
+        self.generations[index] += 1
+        self.alive[index] = 0
+        self.free.append(index)
+        if self.journal is not None:
+            self.journal.append(('release', entity_id, None))
+        return True
+
+    def undo(self, entry):
+        action, entity_id, fresh = entry
+        index = entity_id & INDEX_MASK
+        if action == 'allocate':
+            if fresh:
+                self.generations.pop()
+                self.alive.pop()
+            else:
+                self.alive[index] = 0
+                self.free.append(index)
+        else:
+            # undone newest first the released index is still on top of the free list
+            if self.free[-1] == index:
+                self.free.pop()
+            else:
+                self.free.remove(index)
+            self.generations[index] -= 1
+            self.alive[index] = 1
+
+    def is_alive(self, entity_id):
+        index = entity_id & INDEX_MASK
+        return index < len(self.generations) and self.alive[index] == 1 and \
+            self.generations[index] == entity_id >> INDEX_BITS
+
+    def __len__(self):
+        return len(self.generations) - len(self.free)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(alive={len(self)}, free={len(self.free)})"
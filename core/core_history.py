@@ -0,0 +1,245 @@
+from collections import deque
+from copy import deepcopy
+from dataclasses import fields, is_dataclass
+
+from core.core_objects import CoreException, Entity, allocator, entities, storage
+
+__doc__ = """### Core History ###
+
+ script for frame deltas and rollback, at the end of every frame the rows that changed since
+ the last frame are found through the change ticks and the structural changes through the
+ storage and allocator journals, a delta keeps the values from before and after the frame
+ for only those rows, so the world can be stepped back and forward frame by frame
+
+"""
+
+_field_names = {}
+_immutable = {int, float, complex, bool, str, bytes, frozenset, range, type(None)}
+
+
+def _names(component_type):
+    names = _field_names.get(component_type)
+    if names is None:
+        names = _field_names[component_type] = \
+            tuple(f.name for f in fields(component_type)) if is_dataclass(component_type) else None
+    return names
+
+
+def _copy(value):
+    # mutable values are copied on the way in and out, so a recorded value is never shared with a live component
+    return value if type(value) in _immutable else deepcopy(value)
+
+
+def _values(component):
+    # dataclass components are recorded by their field values, any other component is kept as is
+    names = _names(component.component_type)
+    return component if names is None else tuple(_copy(getattr(component, name)) for name in names)
+
+
+def _build(component_type, values):
+    names = _names(component_type)
+    return values if names is None else component_type(**{name: _copy(value) for name, value in zip(names, values)})
+
+
+def _write(component, values):
+    names = _names(component.component_type)
+    if names is not None:
+        for name, value in zip(names, values):
+            setattr(component, name, _copy(value))
+
+
+def _current(entity_id, component_type):
+    location = storage.locations.get(entity_id)
+    if location is not None:
+        column = location[0].columns.get(component_type)
+        if column is not None:
+            return column.get(location[1])
+    return None
+
+
+class Delta:
+    """### Delta ###
+
+  everything that changed in the world during one frame
+
+    >>> changed
+        list of (entity_id, component type, values before, values after)
+    >>> added / removed
+        list of (entity_id, component type, values) of components attached or removed
+    >>> allocations
+        the allocator journal of the frame, spawned and destroyed entity ids in order
+
+    """
+    __slots__ = ('frame', 'tick', 'changed', 'added', 'removed', 'allocations')
+
+    def __init__(self, frame, tick, changed, added, removed, allocations):
+        self.frame = frame
+        self.tick = tick
+        self.changed = changed
+        self.added = added
+        self.removed = removed
+        self.allocations = allocations
+
+    def __len__(self):
+        return len(self.changed) + len(self.added) + len(self.removed) + len(self.allocations)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(frame={self.frame})[changed={len(self.changed)}, " \
+               f"added={len(self.added)}, removed={len(self.removed)}, allocations={len(self.allocations)}]"
+
+
+class History:
+    """### History ###
+
+  records a Delta per frame and rolls the world back and forward through them,
+  the Scheduler captures a frame at the end of every tick when given a History
+
+    >>> History(frames)
+        frames = how many deltas are kept, older ones are forgotten
+
+    >>> start()
+        records the current values of every component as the base the first delta is taken
+        against and starts the journals, this is the only step that touches every row
+    >>> capture()
+        records and returns the Delta of everything that changed since the last capture
+    >>> rollback(frames)
+        undoes the last frames deltas newest first, returns them oldest first for replay,
+        changes made since the last capture are not part of any delta so capture before rolling back
+    >>> replay(deltas)
+        applies deltas forward again in order, for re-simulating after a rollback
+        capture() the new frames instead when the inputs of the rolled back frames changed
+    >>> stop()
+        stops the journals and forgets every delta
+
+  dataclass components are recorded by their field values, values that aren't immutable scalars
+  are deep copied so writes to the live component can't change a recorded frame, other components
+  are kept as objects and only their attaching and removing is rolled back
+
+    """
+
+    def __init__(self, frames=120):
+        self.deltas = deque(maxlen=frames)
+        self.values = {}
+        self.frame = 0
+        self.tick = 0
+        self.running = False
+
+    def start(self):
+        self.values = {(entity_id, t): _values(component)
+                       for archetype in storage.archetypes.values()
+                       for t, column in archetype.columns.items()
+                       for entity_id, component in zip(archetype.entities, column)}
+        storage.journal, allocator.journal = [], []
+        self.tick = storage.tick
+        storage.next_tick()
+        self.running = True
+        return self
+
+    def stop(self):
+        storage.journal = allocator.journal = None
+        self.deltas.clear()
+        self.values = {}
+        self.running = False
+
+    def capture(self):
+        values = self.values
+        journal, storage.journal = storage.journal, []
+        allocations, allocator.journal = allocator.journal, []
+        changed, added, removed = [], [], []
+        # structural changes are compared by their state before and after the frame, so a component
+        # that was attached and removed again in the same frame leaves nothing behind
+        touched = dict.fromkeys((entity_id, t) for _, entity_id, t in journal)
+        for key in touched:
+            before = values.get(key)
+            component = _current(*key)
+            if component is None:
+                if before is not None:
+                    removed.append((*key, values.pop(key)))
+            else:
+                after = values[key] = _values(component)
+                if before is None:
+                    added.append((*key, after))
+                elif before != after:
+                    changed.append((*key, before, after))
+        for archetype in storage.archetypes.values():
+            if not archetype.entities:
+                continue
+            entity_ids = archetype.entities
+            for t, column in archetype.columns.items():
+                for row in column.changed_since(self.tick):
+                    key = (entity_ids[row], t)
+                    if key in touched:
+                        continue
+                    before, after = values.get(key), _values(column.get(row))
+                    if before != after:
+                        values[key] = after
+                        changed.append((*key, before, after))
+        self.frame += 1
+        delta = Delta(self.frame, self.tick, changed, added, removed, allocations)
+        self.deltas.append(delta)
+        # writes from here on are stamped with a newer tick than the one the next capture compares against
+        self.tick = storage.tick
+        storage.next_tick()
+        return delta
+
+    def _apply(self, delta, forward):
+        # journals are paused so rolling back doesn't record the rollback as a frame of its own
+        storage.journal = allocator.journal = None
+        values = self.values
+        attached, detached = (delta.added, delta.removed) if forward else (delta.removed, delta.added)
+        for entity_id, component_type, _ in detached:
+            for component in storage.remove(entity_id, (component_type,)):
+                component.__detach__()
+            values.pop((entity_id, component_type), None)
+        for action, entity_id, fresh in (delta.allocations if forward else reversed(delta.allocations)):
+            spawned = (action == 'allocate') == forward
+            if not spawned:
+                for component in storage.delete(entity_id):
+                    component.__detach__()
+                entities.pop(entity_id, None)
+            if forward:
+                if action == 'release':
+                    allocator.release(entity_id)
+                elif allocator.allocate() != entity_id:
+                    raise CoreException(self, f"replaying frame {delta.frame} spawned a different entity than "
+                                              f"Entity#{entity_id}, the world was changed after the rollback")
+            else:
+                allocator.undo((action, entity_id, fresh))
+            if spawned:
+                storage.insert(entity_id, [])
+                Entity.from_id(entity_id)
+        for entity_id, component_type, component_values in attached:
+            for component in storage.insert(entity_id, [_build(component_type, component_values)]):
+                component.__attach__(entity_id)
+            values[(entity_id, component_type)] = component_values
+        for entity_id, component_type, before, after in delta.changed:
+            component_values = after if forward else before
+            component = _current(entity_id, component_type)
+            if component is not None:
+                _write(component, component_values)
+                storage.mark_changed(entity_id, component_type)
+                values[(entity_id, component_type)] = component_values
+        storage.journal, allocator.journal = [], []
+        self.tick = storage.tick
+        storage.next_tick()
+
+    def rollback(self, frames=1):
+        undone = []
+        for _ in range(min(frames, len(self.deltas))):
+            delta = self.deltas.pop()
+            self._apply(delta, False)
+            undone.append(delta)
+            self.frame = delta.frame - 1
+        return undone[::-1]
+
+    def replay(self, deltas):
+        for delta in deltas:
+            self._apply(delta, True)
+            self.deltas.append(delta)
+            self.frame = delta.frame
+
+    def __len__(self):
+        return len(self.deltas)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(frames={self.deltas.maxlen})[frame={self.frame}, deltas={len(self)}]"
@@ -1,16 +1,29 @@
 import logging
 import sys
 from abc import abstractmethod
-from itertools import count
-from threading import Thread
+from copy import copy
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from functools import cache
 
 import common
+from core.core_commands import CommandBuffer
+from core.core_entities import EntityAllocator
+from core.core_registry import registry
+from core.core_storage import ArchetypeStorage, Column
 
 ecs_logger = logging.Logger("ECCLES_LOGGER", level=logging.DEBUG)
-entity_count = count()
+allocator = EntityAllocator()
 systems = []
-components = {}
+storage = ArchetypeStorage()
 entities = {}
+entity_types = {}
+
+
+def _debug():
+    # log messages are only built when a handler is listening, attach and detach are hot paths
+    return ecs_logger.handlers and ecs_logger.isEnabledFor(logging.DEBUG)
+
 
 class CoreException(Exception):
     """### CoreException ###
@@ -37,7 +50,7 @@ class CoreException(Exception):
               "\n\r" + \
               f" Object: {self.obj.__class__.__name__}" + \
               "\n\r->" + \
-              f" Variables: {vars(obj)}" + \
+              f" Variables: {vars(obj) if hasattr(obj, '__dict__') else obj}" + \
               "\n\r->" + \
               f" Method: {self.frame}(args = {args},  kwargs = {kwargs}):" + \
               "\n\r->" + \
@@ -45,6 +58,12 @@ class CoreException(Exception):
 
         super().__init__(out)
 
+    def __reduce__(self):
+        # rebuilt from the formatted message so it can be sent back from a worker process,
+        # obj may not be picklable so it is left behind
+        return Exception.__new__, (self.__class__, *self.args), {'obj': None, 'frame': self.frame,
+                                                                  'message': self.message}
+
 
 class Component:
     """### Component ###
@@ -52,7 +71,8 @@ class Component:
 This is the core data holder within the system, systems will enact upon the data stored in components,
 and generally, except for special cases, should contain no methods besides getters/setters
 
-during thair init they add themselves to lists of their component type, this is so Systems can operate on them faster
+when attached they are stored in the archetype table of their entity, entities with the same set of components
+share a table, this is so Systems can operate on them faster by scanning dense rows
 rather than having to do lossy lookups on entities aka if Entity has such and such do thing
 this way our systems only ever operate on the components used in said systems
 
@@ -63,10 +83,28 @@ has abstract methods:
         *arg/**kwargs are for the user to implement
     >>> is_attached()
         check to see if component is attached to an entity
+    >>> mark_changed()
+        stamps the component as changed for change detection, set_value does this for you,
+        call it after writing fields directly
+
+  every subclass gets a component_type attribute naming the type it is stored as,
+  this is the class itself unless the class sets view_of to the component type it is a view over,
+  and a component_id, the dense integer id of its component_type used for bitmask signatures
 
     """
 
     entity_id = None
+    component_type = None
+    component_id = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.component_type = cls.__dict__.get('view_of', cls)
+        if cls.component_type is cls:
+            registry.register(cls, cls.__dict__.get('component_id'))
+        set_value = cls.__dict__.get('set_value')
+        if set_value is not None and not hasattr(set_value, '__marks_changed__'):
+            cls.set_value = _marks_changed(set_value)
 
     @abstractmethod
     def get_value(self):
@@ -80,20 +118,15 @@ has abstract methods:
 
     def __attach__(self, entity_id):
         """
-        attaches component to entity, generally used internally when applying _components to entity object
+        called once the component has been stored in its entity's archetype table,
+        generally used internally when applying _components to entity object
         :param entity_id:
         """
-        if self.__class__.__name__ not in components.keys():
-            components[self.__class__.__name__] = {}
-        components[self.__class__.__name__].update({entity_id: self})
         self.entity_id = entity_id
 
     def __detach__(self):
-        """detaches component from entity"""
-
-        if self.__class__.__name__ not in components.keys():
-            return
-        components[self.__class__.__name__].pop(self.entity_id)
+        """called once the component has been removed from its entity's archetype table"""
+        self.entity_id = None
 
     def is_attached(self):
         """
@@ -101,6 +134,23 @@ has abstract methods:
         """
         return self.entity_id is not None
 
+    def mark_changed(self):
+        if self.entity_id is not None:
+            storage.mark_changed(self.entity_id, self.component_type)
+
+
+def _marks_changed(set_value):
+    # wraps a Component's set_value so every write is seen by change detection
+    def wrapper(self, *args, **kwargs):
+        result = set_value(self, *args, **kwargs)
+        if self.entity_id is not None:
+            storage.mark_changed(self.entity_id, self.component_type)
+        return result
+
+    wrapper.__name__, wrapper.__doc__, wrapper.__wrapped__ = set_value.__name__, set_value.__doc__, set_value
+    wrapper.__marks_changed__ = True
+    return wrapper
+
 
 class Entity:
     """### Entity ###
@@ -120,66 +170,221 @@ class Entity:
     >>> detach(*_components)
         detaches components from the entity
 
+    >>> destroy()
+        detaches every component in one step and frees the entity id, the id may be recycled
+        with a new generation so old handles to the entity are detected as stale
+
+    >>> is_alive()
+        check to see if the entity has not been destroyed
+
+    >>> get(entity_id)
+        returns the live Entity with that id or None
+
+    >>> from_id(entity_id)
+        returns the Entity for an allocated id, creating a handle for it if there isn't one
+
+    >>> signature
+        bitmask of the component ids of the attached components
+
     >>> from_archetype(bluprint, name, class_dict)
         bluprint = a list of component to assign to the entity
         name = the name of the resulting type
         class_dict = a dict of objects to add as members of the class
 
+    >>> spawn(blueprint, count, values, name, class_dict)
+        creates count entities from a blueprint in one step, their rows are added to the blueprint's
+        archetype table together instead of one attach at a time, returns the entities
+        blueprint = a list of component types and components, or an archetype enum such as DefaultLivingCreatures.Player
+        values = dict of {component type: (count, fields) array}, other components are copies of the
+            blueprint's component or the component type's defaults
+
+    >>> subtype(name, class_dict)
+        returns the Entity subclass called name, it is created once and reused
+
     """
 
     def __init__(self, *_components):
-        self.entity_id = entity_count.__next__()
+        self.entity_id = allocator.allocate()
+        entities[self.entity_id] = self
         self.attach(*_components)
 
     def attach(self, *_components):
         """
+        moves the entity into the archetype table matching its new set of components in one step
         :param _components: can be type extending Component or Component
         :return: self
         """
-        log = "Attached: \n\r"
+        if not allocator.is_alive(self.entity_id):
+            raise CoreException(self, f"Entity#{self.entity_id} has been destroyed", *_components)
+        attached = []
         for component in _components:
             if isinstance(component, type):
                 component = component()
-            if issubclass(component.__class__, Component):
-                component.__attach__(self.entity_id)
-                self.__dict__.update({component.__class__.__name__: component})
-                log += f"{component.__class__.__name__}""\n\r"
-            else:
+            if not isinstance(component, Component):
                 raise CoreException(component, "This object is not a Component Object, please check your code",
                                     *_components)
-            ecs_logger.log(logging.DEBUG, log)
-        entities[self.entity_id] = self
+            attached.append(component)
+        stored = storage.insert(self.entity_id, attached)
+        for component in stored:
+            component.__attach__(self.entity_id)
+        if _debug():
+            ecs_logger.log(logging.DEBUG, "Attached: \n\r" +
+                           "".join(f"{component.__class__.__name__}\n\r" for component in stored))
         return self
 
-    def detach(self, _components):
+    def detach(self, *_components):
         """
-        detaches the component and destroys it
-        :param _components:
-        :return:
+        detaches the components and moves the entity to the matching archetype table in one step
+        :param _components: can be a component name, type extending Component, Component or a collection of them
+        :return: self
         """
-        if len(_components) == 1:
-            _components = _components[0]
+        if not allocator.is_alive(self.entity_id):
+            raise CoreException(self, f"Entity#{self.entity_id} has been destroyed", *_components)
+        component_types = []
+        for component in _components:
+            if isinstance(component, (list, tuple, set)):
+                self.detach(*component)
+                continue
+            if isinstance(component, str):
+                component_type = self.__getattr__(component).component_type
+            elif isinstance(component, Component):
+                component_type = component.component_type
+            elif isinstance(component, type):
+                component_type = component
+            else:
+                raise CoreException(self, f" {component} is not attached to {type(self)}#{self.entity_id}", *_components)
+            component_types.append(component_type)
+        for component in storage.remove(self.entity_id, component_types):
+            if _debug():
+                ecs_logger.log(logging.DEBUG, f"detached {component.__class__.__name__} from Entity#{self.entity_id}")
+            component.__detach__()
+        return self
 
-        if isinstance(component, str):
-            ecs_logger.log(logging.DEBUG, f"detached {component} from Entity#{self.entity_id}")
-            self.__dict__.pop(component).__detach__()
+    def destroy(self):
+        """
+        removes the entity and all of its components
+        :return: True if the entity was alive
+        """
+        if not allocator.is_alive(self.entity_id):
+            return False
+        for component in storage.delete(self.entity_id):
+            component.__detach__()
+        entities.pop(self.entity_id, None)
+        allocator.release(self.entity_id)
+        if _debug():
+            ecs_logger.log(logging.DEBUG, f"destroyed Entity#{self.entity_id}")
+        return True
+
+    def is_alive(self):
+        return allocator.is_alive(self.entity_id)
 
-        elif isinstance(component, Component):
-            ecs_logger.log(logging.DEBUG, f"detached {component.__class__.__name__} from Entity#{self.entity_id}")
-            self.__dict__.pop(component.__class__.__name__).__detach__()
+    @classmethod
+    def from_id(cls, entity_id):
+        """
+        :param entity_id: an id handed out by the allocator, for example by CommandBuffer.spawn
+        :return: the Entity with that id, a handle is created for ids that don't have one yet
+        """
+        entity = entities.get(entity_id)
+        if entity is None:
+            entity = entities[entity_id] = cls.__new__(cls)
+            entity.entity_id = entity_id
+        return entity
 
-        elif isinstance(component, type):
-            ecs_logger.log(logging.DEBUG, f"detached {component.__name__} from Entity#{self.entity_id}")
-            self.__dict__.pop(component.__name__).__detach__()
+    @classmethod
+    def get(cls, entity_id):
+        """
+        :param entity_id: id of the entity, stale ids return None
+        :return: Entity or None
+        """
+        return entities.get(entity_id) if allocator.is_alive(entity_id) else None
 
-        elif isinstance(_components, list) or isinstance(_components, tuple) or isinstance(_components, set):
-            for c in _components:
-                self.detach(c)
-        else:
-            raise CoreException(component, f" component not attached to {type(self)}#{self.entity_id}")
+    @property
+    def components(self):
+        """
+        :return: dict of {component type: component} for every attached component
+        """
+        return storage.components_of(self.entity_id)
+
+    @property
+    def signature(self):
+        """
+        :return: bitmask with the bit of every attached component's component_id set
+        """
+        return storage.mask_of(self.entity_id)
+
+    def __getattr__(self, name):
+        # attached components are members of the entity, they are looked up in the entity's archetype row
+        if name != 'entity_id' and self.__dict__.get('entity_id') in storage:
+            try:
+                component = storage.get_by_name(self.entity_id, name)
+            except KeyError as error:
+                raise CoreException(self, error.args[0], name) from None
+            if component is not None:
+                return component
+        raise AttributeError(f"{self.__class__.__name__!r} object has no attribute {name!r}")
 
     def __str__(self):
-        return f"{self.__class__.__name__}({[v for v in self.__dict__.values() if issubclass(v.__class__, Component)]})"
+        return f"{self.__class__.__name__}({list(self.components.values())})"
+
+    @classmethod
+    def subtype(cls, name, class_dict=None):
+        """
+        :param name: name of the type
+        :param class_dict: dict of members of the type
+        :return: the cached subclass of cls, created on first use
+        """
+        try:
+            key = (cls, name, tuple(class_dict.items()) if class_dict else ())
+            hash(key)
+        except TypeError:
+            key = (cls, name, id(class_dict))
+        entity_type = entity_types.get(key)
+        if entity_type is None:
+            entity_type = entity_types[key] = type(name, (cls,), dict(class_dict) if class_dict else {})
+        return entity_type
+
+    @classmethod
+    def spawn(cls, blueprint, count=1, values=None, name=None, class_dict=None):
+        """
+        :param blueprint: list of component types and components, or an archetype enum member
+        :param count: number of entities to create
+        :param values: dict of {component type: (count, fields) array} of the starting values,
+            every component type must be in the blueprint
+        :param name: name of the entity type, defaults to the archetype's name
+        :param class_dict: dict of members of the entity type
+        :return: list of the new entities
+        """
+        if isinstance(blueprint, Enum):
+            blueprint, name = blueprint.value[0], name or blueprint.value[1]
+        entity_type = cls.subtype(name, class_dict) if name else cls
+        templates = {}
+        for component in blueprint:
+            component_type = component if isinstance(component, type) else component.component_type
+            templates[component_type] = component
+        values = values or {}
+        unknown = [component_type for component_type in values if component_type not in templates]
+        if unknown:
+            raise CoreException(values, f"{[c.__name__ for c in unknown]} are not in the blueprint", blueprint)
+        archetype = storage.archetype(frozenset(templates))
+        columns = {}
+        for component_type, template in templates.items():
+            column = archetype.columns[component_type]
+            rows = values.get(component_type)
+            columns[component_type] = _rows(column, template, count, rows)
+        entity_ids = [allocator.allocate() for _ in range(count)]
+        stored = storage.insert_many(entity_ids, columns)
+        for components in stored.values():
+            for entity_id, component in zip(entity_ids, components):
+                component.__attach__(entity_id)
+        spawned = []
+        new = entity_type.__new__
+        for entity_id in entity_ids:
+            entity = entities[entity_id] = new(entity_type)
+            entity.entity_id = entity_id
+            spawned.append(entity)
+        if _debug():
+            ecs_logger.log(logging.DEBUG, f"spawned {count} {entity_type.__name__} with {list(templates)}")
+        return spawned
 
     @classmethod
     def from_archetype(cls, blueprint: list[Component], name=None, class_dict=None):
@@ -191,20 +396,47 @@ class Entity:
         :return: entity with archetype
         """
         if name:
-            e = type(name, (Entity,), class_dict if class_dict else {})(*blueprint)
+            e = cls.subtype(name, class_dict)(*blueprint)
         else:
             e = Entity(*blueprint)
             if class_dict:
                 e.__dict__.update(class_dict)
         return e
 
-    def __del__(self):
-        for i in self.__dict__.values():
-            if issubclass(i.__class__, Component):
-                i.__detach__()
+
+@cache
+def _field_names(component_type):
+    # names of the fields a dataclass component is built from in order, None for other components
+    return tuple(f.name for f in fields(component_type) if f.init) if is_dataclass(component_type) else None
 
 
-class System(Thread):
+def _rows(column, template, count, rows):
+    # what a column's extend takes for count new rows, array columns are filled straight from values
+    if not isinstance(column, Column):
+        if rows is None:
+            prototype = template() if isinstance(template, type) else template
+            rows = [[getattr(prototype, name) for name in column.fields]] * count
+        return column.as_rows(rows, count)
+    if rows is not None:
+        # built by field name, so keyword only components work too
+        component_type, names = column.component_type, _field_names(column.component_type)
+        rows = rows.tolist() if hasattr(rows, 'tolist') else rows
+        if names is None:
+            return [component_type(*row) for row in rows]
+        return [component_type(**dict(zip(names, row))) for row in rows]
+    if isinstance(template, type):
+        return [template() for _ in range(count)]
+    if is_dataclass(template):
+        # dataclass components are rebuilt from the template's fields, much faster than copying
+        component_type, kwargs = type(template), {f.name: getattr(template, f.name) for f in fields(template) if f.init}
+        return [component_type(**kwargs) for _ in range(count)]
+    return [copy(template) for _ in range(count)]
+
+
+commands = CommandBuffer(allocator, Entity)
+
+
+class System:
     """### System ###
 
   Core System object for the ECS system,
@@ -212,60 +444,157 @@ class System(Thread):
   this helps keep data organized, allows for modularization and ease of updating
 
     >>> collect()
-        method used to collect components from lists and organize the data for processing
+        returns the system's cached Query, iterating it yields (entity_id, *components) rows,
+        systems with changed or added filters get a QueryView of the rows changed since their last update
 
     >>> update(*component_list)
         if provided a list of components (in the correct structure for said system)
         will perform systems update operations on them, if not provided args will
         process in the default fashion by using the collect method
 
+    >>> begin() / run(*component_list)
+        the two halves of update, begin takes the system's tick and run processes with every write
+        stamped with it, the Scheduler begins every system of a stage before running any of them
+        and advances the tick once the stage is done
+
     >>> start()
-        starts the processing thread, small amount of init
+        marks the system as running, running systems are updated by the Scheduler every tick
+
+    >>> stop()
+        marks the system as stopped, the Scheduler skips it until it is started again
+
+  systems are run in ascending order, ties are run in the order the systems were created,
+  delta_time is set by the Scheduler to the time that passed since the system's last update,
+  a system ticks at the Scheduler's tick rate unless it sets rate (ticks per second) to its own
+
+  structural changes made while processing should be recorded into self.commands (a CommandBuffer),
+  the Scheduler applies them in one pass at the end of every tick
+
+  systems declare which components they read and write, the Scheduler runs systems that don't
+  conflict side by side, by default every managed component is treated as written
 
-    >>> run()
-        triggered by start method and runs the update cycle
+    >>> conflicts(other)
+        check to see if this system and other can't safely run at the same time
+
+    >>> matches(entity_id)
+        check to see if the system processes the entity, a single bitmask test of the entity's signature
+
+  setting executor to 'process' runs the system's work in a process pool instead of a thread,
+  for pure python CPU heavy systems, the work is split in three steps:
+
+    >>> prepare()
+        runs in the main process, returns picklable data for kernel, by default
+        a list of (entity_id, *component values) rows
+    >>> kernel(data)
+        static method run in a worker process, returns picklable results
+    >>> apply(results)
+        runs in the main process, by default results are (entity_id, *values) rows in
+        managed_components order and the values are set on the written components
+
+  setting executor to 'shared' runs the system in its own worker process that maps the shared memory
+  columns of its tables (see core.core_shared), every managed component must be stored in a SharedArrayColumn
+
+    >>> shared_kernel(tables, delta_time)
+        static method run in the worker each tick, tables is a list of {component name: (rows, fields) array}
+        with one dict per archetype table, writes to the arrays are seen by the main process
 
     """
 
-    def __init__(self, *managed):
+    order = 0
+    rate = None
+    delta_time = 1.
+    executor = 'thread'
+    since = 0
+    last_run = 0
+
+    def __init__(self, *managed, optional=(), excluded=(), changed=(), added=(), reads=None, writes=None):
         """
         :param managed: _components this system checks for from component pools
+        :param optional: _components yielded alongside the managed ones when present, None otherwise
+        :param excluded: _components an entity must not have to be processed by this system
+        :param changed: _components that must have changed since the system's last update
+        :param added: _components that must have been added since the system's last update
+        :param reads: _components this system only reads
+        :param writes: _components this system writes, if neither reads or writes is given
+            every managed and optional component is treated as written
         """
-        super().__init__(name=self.__class__.__name__, daemon=True)
+        self.name = self.__class__.__name__
+        self.commands = commands
         self.managed_components = [_c for _c in managed if issubclass(_c, Component)]
-        for _c in self.managed_components:
-            if _c.__name__ not in components.keys():
-                components[_c.__name__] = []
+        self.query = storage.query(*self.managed_components, optional=optional, excluded=excluded,
+                                   changed=changed, added=added)
+        if reads is None and writes is None:
+            writes = (*self.managed_components, *optional)
+        self.reads = frozenset(reads or ())
+        self.writes = frozenset(writes or ())
         systems.append(self)
         self.running = False
 
     def collect(self):
-        # components[key] yields a dict with [entity_id: Component]
-        # collected contains an indeterminate number of dicts, I want to compare the lists of keys
-        # and return a named tuple of lists of values in those dicts for each key that is in all dicts
-        # this way we can iterate through each one and apply data
-        return tuple(components[key.__name__] for key in self.managed_components)
+        # the query keeps the list of matching archetype tables up to date as tables are created,
+        # iterating it yields rows of (entity_id, *managed components, *optional components),
+        # with changed/added filters only the rows that changed since the last update are yielded
+        return self.query.since(self.since) if self.query.filtered else self.query
+
+    def begin(self):
+        # every run gets its own tick, taken before any system of its stage starts
+        self.since, self.last_run = self.last_run, storage.next_tick()
+
+    def run(self, *component_list):
+        # writes made during process are stamped with last_run, even while other systems take ticks
+        with storage.stamping(self.last_run):
+            self.process(component_list if component_list else self.collect())
 
     def update(self, *component_list):
-        self.process(component_list if component_list else self.collect())
+        # the tick is advanced again afterwards so later writes are newer than last_run
+        self.begin()
+        try:
+            self.run(*component_list)
+        finally:
+            storage.next_tick()
 
     @abstractmethod
     def process(self, *args, **kwargs):
         """
-        method to be overloaded y user, here you will receive a tuple of dicts
+        method to be overloaded y user, here you will receive an iterable of (entity_id, *components) rows
         :param args:
         :param kwargs:
         :return:
         """
         pass
 
-    def start(self):
-        super().start()
+    def matches(self, entity_id):
+        return self.query.accepts(storage.mask_of(entity_id))
 
-    def run(self):
+    def conflicts(self, other):
+        return not (self.writes.isdisjoint(other.reads) and self.writes.isdisjoint(other.writes)
+                    and self.reads.isdisjoint(other.writes))
+
+    def prepare(self):
+        return [(entity_id, *(component.get_value() for component in row)) for entity_id, *row in self.collect()]
+
+    @staticmethod
+    def kernel(data):
+        """method to be overloaded by user when executor is 'process', must be picklable"""
+        raise CoreException(data, "kernel must be implemented by systems that run in a process")
+
+    @staticmethod
+    def shared_kernel(tables, delta_time):
+        """method to be overloaded by user when executor is 'shared', must be picklable"""
+        raise CoreException(tables, "shared_kernel must be implemented by systems that run in a worker process",
+                            delta_time=delta_time)
+
+    def apply(self, results):
+        written = [(index, _c) for index, _c in enumerate(self.managed_components) if _c in self.writes]
+        for entity_id, *values in results:
+            for index, _c in written:
+                storage.get(entity_id, _c).set_value(values[index])
+
+    def start(self):
         self.running = True
-        while self.running:
-            self.update()
+
+    def stop(self):
+        self.running = False
 
     def __str__(self):
         return f"{self.__class__.__name__}: {[_c.__name__ for _c in self.managed_components]}"
@@ -277,5 +606,8 @@ __doc__ = """## Core ##
 
 """
 
-for c in common.get_class_docs(__name__):
-    __doc__ += " " + str(c)
+
+@cache
+def docs():
+    """:return: the module docs followed by the docs of every class in it, built the first time they are asked for"""
+    return __doc__ + "".join(" " + str(c) for c in common.get_class_docs(__name__))
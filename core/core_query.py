@@ -0,0 +1,140 @@
+from itertools import repeat
+
+from core.core_registry import registry
+
+__doc__ = """### Core Query ###
+
+ script for cached queries over the archetype tables, a query remembers which tables
+ match it and is told about every new table as it is created, so matching is never
+ redone from scratch while iterating
+
+"""
+
+
+class Query:
+    """### Query ###
+
+  cached join over the archetype tables, yields a row for every entity that has all the
+  required components and none of the excluded ones, optional components are None when missing
+
+    >>> Query(*required, optional=(), excluded=(), changed=(), added=())
+        *required = component types every matched entity must have
+        optional = component types that are yielded when present
+        excluded = component types matched entities must not have
+        changed = component types that must have changed since the tick given to since()
+        added = component types that must have been added since the tick given to since()
+
+    >>> iter(query)
+        yields (entity_id, *required components, *optional components)
+    >>> tables()
+        yields every non empty matched Archetype, for systems that work on whole columns
+    >>> matches(archetype)
+        check to see if an Archetype satisfies the query
+    >>> accepts(mask)
+        check to see if a component bitmask satisfies the query, a single integer test
+    >>> since(tick)
+        returns a QueryView of the rows that pass the changed and added filters since tick
+    >>> selected(archetype, tick)
+        returns the rows of a matched Archetype that pass the changed and added filters since tick
+
+    """
+
+    def __init__(self, *required, optional=(), excluded=(), changed=(), added=()):
+        self.required = tuple(required)
+        self.optional = tuple(optional)
+        self.excluded = frozenset(excluded)
+        self.changed = tuple(changed)
+        self.added = tuple(added)
+        self.filtered = bool(self.changed or self.added)
+        self.signature = frozenset(self.required)
+        self.mask = registry.mask(self.required)
+        self.excluded_mask = registry.mask(self.excluded)
+        self.archetypes = []
+
+    def accepts(self, mask):
+        return mask & self.mask == self.mask and not mask & self.excluded_mask
+
+    def matches(self, archetype):
+        return self.accepts(archetype.mask)
+
+    def __archetype__(self, archetype):
+        """called by the storage for every archetype, including ones created after the query"""
+        if self.matches(archetype):
+            self.archetypes.append(archetype)
+
+    def since(self, tick):
+        return QueryView(self, tick)
+
+    def selected(self, archetype, tick):
+        rows = None
+        columns = archetype.columns
+        filters = [(t, 'changed_since') for t in self.changed] + [(t, 'added_since') for t in self.added]
+        for component_type, since in filters:
+            column = columns.get(component_type)
+            found = getattr(column, since)(tick) if column is not None else ()
+            if rows is None:
+                rows = found
+            else:
+                found = set(found)
+                rows = [row for row in rows if row in found]
+        return range(len(archetype)) if rows is None else rows
+
+    def tables(self):
+        for archetype in self.archetypes:
+            if archetype.entities:
+                yield archetype
+
+    def __iter__(self):
+        required, optional = self.required, self.optional
+        for archetype in self.archetypes:
+            if not archetype.entities:
+                continue
+            columns = archetype.columns
+            yield from zip(archetype.entities,
+                           *(columns[t] for t in required),
+                           *(columns[t] if t in columns else repeat(None) for t in optional))
+
+    def __len__(self):
+        return sum(len(archetype) for archetype in self.archetypes)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(required={[t.__name__ for t in self.required]}, " \
+               f"optional={[t.__name__ for t in self.optional]}, " \
+               f"excluded={[t.__name__ for t in self.excluded]})[archetypes={len(self.archetypes)}]"
+
+
+class QueryView:
+    """### QueryView ###
+
+  the rows of a Query that pass its changed and added filters since a tick,
+  returned by Query.since and by System.collect for systems with filters
+
+    >>> iter(view)
+        yields (entity_id, *required components, *optional components) for the selected rows
+    >>> tables()
+        yields (Archetype, rows) for every matched Archetype with selected rows
+
+    """
+    __slots__ = ('query', 'tick')
+
+    def __init__(self, query, tick):
+        self.query = query
+        self.tick = tick
+
+    def tables(self):
+        for archetype in self.query.tables():
+            rows = self.query.selected(archetype, self.tick)
+            if len(rows):
+                yield archetype, rows
+
+    def __iter__(self):
+        required, optional = self.query.required, self.query.optional
+        for archetype, rows in self.tables():
+            entities, columns = archetype.entities, archetype.columns
+            for row in rows:
+                yield (entities[row],
+                       *(columns[t].get(row) for t in required),
+                       *(columns[t].get(row) if t in columns else None for t in optional))
+
+    def __len__(self):
+        return sum(len(rows) for archetype, rows in self.tables())
@@ -0,0 +1,60 @@
+__doc__ = """### Core Registry ###
+
+ script for numbering component types, every component class gets a dense integer id when it
+ is defined, a set of component types is then a bitmask with one bit per id, so tables and
+ queries are matched with a single integer test instead of comparing sets or names
+
+"""
+
+
+class ComponentRegistry:
+    """### ComponentRegistry ###
+
+  hands out component ids in the order component classes are defined,
+  ids never depend on class names so classes with the same name in different modules never collide
+
+    >>> register(component_type, component_id)
+        gives the type the next id and stores it as component_type.component_id, returns the id,
+        a component_id that is given takes over that id, for classes rebuilt by @dataclass(slots=True)
+    >>> mask(component_types)
+        returns the bitmask of a collection of registered types
+    >>> types_of(mask)
+        returns the registered types whose bits are set in mask, in id order
+
+    """
+    __slots__ = ('types',)
+
+    def __init__(self):
+        self.types = []
+
+    def register(self, component_type, component_id=None):
+        if component_id is None:
+            component_id = len(self.types)
+            self.types.append(component_type)
+        else:
+            self.types[component_id] = component_type
+        component_type.component_id = component_id
+        return component_id
+
+    def mask(self, component_types):
+        mask = 0
+        for component_type in component_types:
+            mask |= 1 << component_type.component_id
+        return mask
+
+    def types_of(self, mask):
+        types = []
+        while mask:
+            low = mask & -mask
+            types.append(self.types[low.bit_length() - 1])
+            mask ^= low
+        return types
+
+    def __len__(self):
+        return len(self.types)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(types={len(self)})"
+
+
+registry = ComponentRegistry()
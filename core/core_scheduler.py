@@ -0,0 +1,289 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Event
+
+from core import core_objects, core_trace
+from core.core_clock import Clock
+
+__doc__ = """### Core Scheduler ###
+
+ script for the world scheduler, a single loop that updates every registered system
+ in order at fixed tick rates instead of each system spinning its own thread
+
+"""
+
+
+class Scheduler:
+    """### Scheduler ###
+
+  owns the registered systems and updates the running ones in order at fixed tick rates,
+  a root Clock reads real time and every rate in use gets a child clock, each due tick runs
+  the systems of that rate with a delta_time of one period, so simulation speed doesn't
+  depend on how fast the machine is
+
+  systems run at tick_rate unless they set their own rate, for example physics at 120,
+  networking at 30 and AI at 10, ticks of different rates are run in time order
+
+    >>> Scheduler(tick_rate, systems, max_steps, workers, processes, events, tracer, history)
+        tick_rate = ticks per second of systems that don't set a rate
+        systems = list of systems to run, defaults to every System created so far
+        max_steps = the most ticks a clock runs to catch up in one step, the rest are dropped
+        workers = size of the thread pool systems are run on, 0 runs every system on the loop thread
+        processes = size of the process pool for systems with executor = 'process'
+        events = an events.EventBus to deliver at the end of every tick
+        tracer = the core_trace.Tracer ticks are recorded into while it is enabled, defaults to core_trace.tracer
+        history = a core_history.History that captures a delta at the end of every tick while it is started
+
+  systems with executor = 'shared' get a SharedWorker process of their own, every tick the worker
+  is sent the layout of the system's tables and the stage waits for it like a frame barrier
+
+    >>> stages(rate)
+        splits the running systems of a rate (every rate if None) into stages, systems in a stage
+        don't conflict with each other and a system is always placed after every earlier system it conflicts with
+    >>> tick(rate)
+        updates the running systems of a rate (every rate if None) once with a delta_time of one period,
+        stage by stage, then applies the structural changes recorded in the command buffer, delivers
+        the frame's events and forgets removals every running system has seen
+    >>> clock_for(rate)
+        returns the child clock of a rate, creating it if needed
+    >>> step()
+        runs every tick that is due since the last step, returns the number of ticks run
+    >>> run()
+        steps and sleeps until the next tick until stop() is called
+    >>> start() / stop()
+        runs the loop on a background thread, stops it and stops the systems
+    >>> with Scheduler(...) as scheduler:
+        starts the systems and the loop, everything is cleanly shut down on exit
+
+  exposes frame_time (seconds the last tick took), tick_count, overruns (ticks that took
+  longer than their period) and dropped (ticks skipped because the loop fell too far behind)
+
+  while the tracer is enabled every tick records a span per system with its wall time, CPU time
+  and the number of entities its query matched, plus a counter of the tick's structural changes
+
+    """
+
+    def __init__(self, tick_rate=60., systems=None, max_steps=5, workers=0, processes=0, events=None,
+                 tracer=None, history=None):
+        self.systems = systems if systems is not None else core_objects.systems
+        self.events = events
+        self.history = history
+        self.tracer = tracer if tracer is not None else core_trace.tracer
+        self.workers = workers
+        self.processes = processes
+        self.thread_pool = None
+        self.process_pool = None
+        self.shared_workers = {}
+        self.plans = {}
+        self.tick_rate = tick_rate
+        self.time_step = 1. / tick_rate
+        self.max_steps = max_steps
+        self.clock = Clock(max_catch_up=max_steps)
+        self.clocks = {}
+        self.frame_time = 0.
+        self.tick_count = 0
+        self.overruns = 0
+        self.thread = None
+        self.stopped = Event()
+
+    def ordered(self):
+        return sorted(self.systems, key=lambda system: system.order)
+
+    def rate_of(self, system):
+        return system.rate or self.tick_rate
+
+    def clock_for(self, rate):
+        clock = self.clocks.get(rate)
+        if clock is None:
+            clock = self.clocks[rate] = self.clock.child(rate)
+        return clock
+
+    def stages(self, rate=None):
+        running = tuple(system for system in self.ordered()
+                        if system.running and (rate is None or self.rate_of(system) == rate))
+        plan = self.plans.get(running)
+        if plan is None:
+            stages = []
+            levels = {}
+            for index, system in enumerate(running):
+                level = max((levels[earlier] + 1 for earlier in running[:index] if system.conflicts(earlier)),
+                            default=0)
+                levels[system] = level
+                if level == len(stages):
+                    stages.append([])
+                stages[level].append(system)
+            plan = self.plans[running] = stages
+        return plan
+
+    def shared_worker(self, system):
+        worker = self.shared_workers.get(system)
+        if worker is None:
+            from core.core_shared import SharedWorker
+            worker = self.shared_workers[system] = SharedWorker(system)
+        return worker
+
+    def run_system(self, system):
+        """runs a system that has begun on this thread, its writes are stamped with its last_run"""
+        if system.executor == 'process':
+            results = type(system).kernel(system.prepare())
+            with core_objects.storage.stamping(system.last_run):
+                system.apply(results)
+        elif system.executor == 'shared':
+            self.shared_worker(system).submit(system.delta_time)()
+        else:
+            system.run()
+
+    def traced(self, system):
+        """
+        :return: callable that runs the system and records a span of it into the tracer
+        """
+        return self.tracer.timed(system.name, self.run_system, 'system', executor=system.executor,
+                                 entities=len(system.query))
+
+    def submit(self, system, trace=False):
+        """
+        starts a system that has begun on the matching pool or worker
+        :return: callable that waits for the system to finish
+        """
+        if trace:
+            return self.submit_traced(system)
+        if system.executor == 'shared':
+            return self.shared_worker(system).submit(system.delta_time)
+        if system.executor == 'process' and self.processes:
+            if self.process_pool is None:
+                from concurrent.futures import ProcessPoolExecutor
+                self.process_pool = ProcessPoolExecutor(self.processes)
+            future = self.process_pool.submit(type(system).kernel, system.prepare())
+
+            def wait():
+                results = future.result()
+                with core_objects.storage.stamping(system.last_run):
+                    system.apply(results)
+
+            return wait
+        if system.executor != 'process' and self.workers:
+            if self.thread_pool is None:
+                self.thread_pool = ThreadPoolExecutor(self.workers, thread_name_prefix=self.__class__.__name__)
+            return self.thread_pool.submit(system.run).result
+        return lambda: self.run_system(system)
+
+    def submit_traced(self, system):
+        if system.executor == 'thread' or system.executor == 'process' and not self.processes:
+            traced = self.traced(system)
+            if system.executor != 'thread' or not self.workers:
+                return lambda: traced(system)
+            if self.thread_pool is None:
+                self.thread_pool = ThreadPoolExecutor(self.workers, thread_name_prefix=self.__class__.__name__)
+            return self.thread_pool.submit(traced, system).result
+        # work in other processes is timed from submitting to the end of the wait, without CPU time
+        start = time.perf_counter()
+        wait = self.submit(system)
+
+        def traced():
+            wait()
+            self.tracer.record(system.name, start, time.perf_counter() - start, None, 'system',
+                               executor=system.executor, entities=len(system.query))
+
+        return traced
+
+    def tick(self, rate=None):
+        start = time.perf_counter()
+        trace = self.tracer.enabled
+        if trace:
+            cpu, changes = time.thread_time(), core_objects.storage.structural_changes
+        storage = core_objects.storage
+        for stage in self.stages(rate):
+            # every system of the stage takes its tick before any of them starts and the tick is only
+            # advanced again once they are all done, so a system's writes are stamped with its own tick
+            for system in stage:
+                system.delta_time = 1. / self.rate_of(system)
+                system.begin()
+            try:
+                if len(stage) == 1:
+                    if trace:
+                        self.traced(stage[0])(stage[0])
+                    else:
+                        self.run_system(stage[0])
+                else:
+                    for wait in [self.submit(system, trace) for system in stage]:
+                        wait()
+            finally:
+                storage.next_tick()
+        applied = core_objects.commands.apply()
+        if self.history is not None and self.history.running:
+            self.history.capture()
+        if self.events is not None:
+            self.events.deliver()
+        # removals are kept until every running system has had a chance to see them,
+        # stopped systems don't hold the log back
+        storage.trim_removed(min((system.last_run for system in self.systems if system.running),
+                                 default=storage.tick))
+        self.frame_time = time.perf_counter() - start
+        if trace:
+            self.tracer.record('tick', start, self.frame_time, time.thread_time() - cpu, 'tick',
+                               rate=rate or self.tick_rate)
+            self.tracer.counter('structural changes', moves=core_objects.storage.structural_changes - changes,
+                                commands=applied)
+        self.tick_count += 1
+        if self.frame_time > 1. / (rate or self.tick_rate):
+            self.overruns += 1
+
+    def step(self):
+        self.clock_for(self.tick_rate)
+        for system in self.systems:
+            if system.running:
+                self.clock_for(self.rate_of(system))
+        due = self.clock.advance()
+        for _, clock in due:
+            self.tick(clock.rate)
+        return len(due)
+
+    @property
+    def dropped(self):
+        return sum(clock.dropped for clock in self.clocks.values())
+
+    @property
+    def alpha(self):
+        """:return: how far into the next tick_rate tick real time is, from 0 to 1, for interpolating between ticks"""
+        clock = self.clock_for(self.tick_rate)
+        return min((self.clock.timer() - self.clock.origin) / clock.period - clock.ticks, 1.) \
+            if self.clock.origin is not None else 0.
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.step()
+            self.stopped.wait(self.clock.next_tick())
+
+    def start(self):
+        for system in self.systems:
+            system.start()
+        self.stopped.clear()
+        self.thread = Thread(target=self.run, name=self.__class__.__name__, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        for system in self.systems:
+            system.stop()
+        for pool in (self.thread_pool, self.process_pool):
+            if pool is not None:
+                pool.shutdown()
+        self.thread_pool = self.process_pool = None
+        for worker in self.shared_workers.values():
+            worker.close()
+        self.shared_workers.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(tick_rate={self.tick_rate}, systems={len(self.systems)})" \
+               f"[ticks={self.tick_count}, frame_time={self.frame_time:.6f}, overruns={self.overruns}, " \
+               f"dropped={self.dropped}]"
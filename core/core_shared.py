@@ -0,0 +1,160 @@
+from multiprocessing import Pipe, Process
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from core.core_columns import ArrayColumn
+from core.core_objects import CoreException
+
+__doc__ = """### Core Shared ###
+
+ script for running systems in worker processes, component columns are allocated in
+ shared memory blocks that the workers map straight into NumPy arrays, so no component
+ data is copied between processes, the scheduler hands a worker the layout of the tables
+ each frame and waits for it to finish before the frame moves on
+
+"""
+
+
+def _attach(name):
+    # workers only map blocks, the main process owns them and is the only one that unlinks them,
+    # before python 3.13 workers share the main process's resource tracker so registering again is harmless
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        return SharedMemory(name=name)
+
+
+def _free(block):
+    try:
+        block.close()
+    except BufferError:
+        pass  # an array still points into the block, it is released once that array is gone
+    block.unlink()
+
+
+class SharedArrayColumn(ArrayColumn):
+    """### SharedArrayColumn ###
+
+  ArrayColumn whose array lives in a multiprocessing.shared_memory block,
+  when the column grows a new block is made and the old one is unlinked
+
+    >>> layout()
+        (block name, rows, capacity, fields, dtype) used by workers to map the live rows
+
+    """
+    __slots__ = ('block',)
+
+    def allocate(self, shape, dtype):
+        self.block = SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+        return np.ndarray(shape, dtype, buffer=self.block.buf)
+
+    def adopt(self, values):
+        # loaded arrays are copied into a block of their own so workers can map them
+        block = getattr(self, 'block', None)
+        adopted = self.allocate(values.shape, self.dtype)
+        adopted[:] = values
+        if block is not None:
+            _free(block)
+        return adopted
+
+    def _grow(self, minimum=0):
+        block = self.block
+        super()._grow(minimum)
+        _free(block)
+
+    def layout(self):
+        return self.block.name, len(self.views), len(self.values), len(self.fields), self.dtype.str
+
+    def __del__(self):
+        self.values = None
+        try:
+            _free(self.block)
+        except (AttributeError, FileNotFoundError):
+            pass
+
+
+def _worker(kernel, connection):
+    blocks = {}
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        layouts, delta_time = message
+        names = {layout[0] for table in layouts for layout in table.values()}
+        for name in set(blocks) - names:
+            blocks.pop(name).close()
+        tables = []
+        for table in layouts:
+            arrays = {}
+            for component, (name, rows, capacity, width, dtype) in table.items():
+                if name not in blocks:
+                    blocks[name] = _attach(name)
+                arrays[component] = np.ndarray((capacity, width), dtype, buffer=blocks[name].buf)[:rows]
+            tables.append(arrays)
+        try:
+            kernel(tables, delta_time)
+            connection.send(None)
+        except Exception as exception:
+            connection.send(exception)
+        tables = arrays = None
+    for block in blocks.values():
+        block.close()
+
+
+class SharedWorker:
+    """### SharedWorker ###
+
+  worker process that runs a system's shared_kernel on the shared memory columns of its tables
+
+    >>> SharedWorker(system)
+        system = a System with executor = 'shared' and a static shared_kernel(tables, delta_time),
+        tables is a list of {component name: (rows, fields) array}, one dict per archetype table
+    >>> submit(delta_time)
+        sends the current table layout to the worker, returns a callable that waits for the frame to finish,
+        the system must have begun (System.begin) and the written rows are stamped with its last_run
+    >>> close()
+        stops the worker process
+
+    """
+
+    def __init__(self, system):
+        self.system = system
+        self.connection, worker_connection = Pipe()
+        self.process = Process(target=_worker, args=(type(system).shared_kernel, worker_connection),
+                               name=f"{system.name}Worker", daemon=True)
+        self.process.start()
+
+    def layouts(self):
+        layouts = []
+        for table in self.system.query.tables():
+            layout = {}
+            for component_type in self.system.managed_components:
+                column = table.columns[component_type]
+                if not isinstance(column, SharedArrayColumn):
+                    raise CoreException(self, f"{component_type.__name__} is not stored in shared memory, "
+                                              f"{self.system.name} can't run in a worker process")
+                layout[component_type.__name__] = column.layout()
+            layouts.append(layout)
+        return layouts
+
+    def submit(self, delta_time):
+        self.connection.send((self.layouts(), delta_time))
+        return self.wait
+
+    def wait(self):
+        exception = self.connection.recv()
+        if exception is not None:
+            raise exception
+        # the worker can't stamp its writes, so every row of the written columns is marked as changed
+        tick = self.system.last_run
+        for table in self.system.query.tables():
+            for component_type in self.system.writes:
+                if component_type in table.columns:
+                    table.columns[component_type].mark_all_changed(tick)
+
+    def close(self):
+        if self.process.is_alive():
+            self.connection.send(None)
+            self.process.join()
+        self.connection.close()
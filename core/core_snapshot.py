@@ -0,0 +1,229 @@
+import importlib
+import json
+import pickle
+from dataclasses import fields, is_dataclass
+from itertools import repeat
+
+import numpy as np
+
+from core.core_columns import ArrayColumn
+from core.core_objects import Component, CoreException, Entity, allocator, storage
+
+__doc__ = """### Core Snapshot ###
+
+ script for saving the world to a binary file and loading it back, every archetype table is
+ written as whole columns laid out from the component dataclass fields, loading memory maps
+ the file and hands the arrays to the storage, columnar components are used straight from the
+ mapped file and are only copied by the pages that get written to
+
+ fields that aren't int, float or bool are pickled, only load snapshots you made yourself
+
+"""
+
+MAGIC = b'ECCLESSN'
+VERSION = 1
+ALIGNMENT = 64
+
+_field_dtypes = {int: np.int64, float: np.float64, bool: np.bool_, 'int': np.int64, 'float': np.float64,
+                 'bool': np.bool_}
+
+
+def _path(component_type):
+    return f"{component_type.__module__}:{component_type.__qualname__}"
+
+
+def _type(path):
+    module, qualname = path.split(':')
+    component_type = importlib.import_module(module)
+    for name in qualname.split('.'):
+        component_type = getattr(component_type, name)
+    return component_type
+
+
+def schema(component_type):
+    """
+    :param component_type: a Component type
+    :return: (NumPy dtype of the numeric fields, names of the other fields),
+        components that aren't dataclasses have no numeric fields and are pickled whole
+    """
+    if not is_dataclass(component_type):
+        return np.dtype([]), None
+    numeric, other = [], []
+    for f in fields(component_type):
+        dtype = _field_dtypes.get(f.type)
+        if dtype is None:
+            other.append(f.name)
+        else:
+            numeric.append((f.name, dtype))
+    return np.dtype(numeric), other
+
+
+class _Writer:
+    # lays blocks out one after the other at aligned offsets, the header records where each one is
+
+    def __init__(self):
+        self.blocks = []
+        self.size = 0
+
+    def add(self, array):
+        array = np.ascontiguousarray(array)
+        offset = -(-self.size // ALIGNMENT) * ALIGNMENT
+        self.blocks.append((offset, array))
+        self.size = offset + array.nbytes
+        return {'offset': offset, 'dtype': array.dtype.descr if array.dtype.names else array.dtype.str,
+                'shape': array.shape}
+
+    def add_objects(self, objects):
+        return self.add(np.frombuffer(pickle.dumps(objects, pickle.HIGHEST_PROTOCOL), np.uint8))
+
+    def write(self, path, header):
+        header = json.dumps(header).encode()
+        start = -(-(len(MAGIC) + 12 + len(header)) // ALIGNMENT) * ALIGNMENT
+        with open(path, 'wb') as file:
+            file.write(MAGIC + np.uint32(VERSION).tobytes() + np.uint64(len(header)).tobytes() + header)
+            for offset, array in self.blocks:
+                file.seek(start + offset)
+                array.tofile(file)
+            file.truncate(start + self.size)
+
+
+def _column(writer, column):
+    if isinstance(column, ArrayColumn):
+        return {'kind': 'array', 'fields': column.fields, 'block': writer.add(column.array)}
+    dtype, other = schema(column.component_type)
+    if other is None or not dtype.names:
+        return {'kind': 'objects', 'objects': writer.add_objects(list(column))}
+    names = dtype.names
+    records = np.array([tuple(getattr(component, name) for name in names) for component in column], dtype)
+    saved = {'kind': 'records', 'block': writer.add(records)}
+    if other:
+        saved['objects'] = writer.add_objects([{name: getattr(component, name) for name in other}
+                                               for component in column])
+    return saved
+
+
+def save(path):
+    """
+    writes every entity and its components to path
+    :param path: file to write
+    :return: path
+    """
+    writer = _Writer()
+    archetypes = []
+    for archetype in storage.archetypes.values():
+        if archetype.entities:
+            archetypes.append({
+                'entities': writer.add(np.array(archetype.entities, np.uint64)),
+                'columns': {_path(t): _column(writer, archetype.columns[t]) for t in archetype.types},
+            })
+    header = {
+        'version': VERSION,
+        'allocator': {'generations': writer.add(np.array(allocator.generations, np.int64)),
+                      'alive': writer.add(np.frombuffer(bytes(allocator.alive), np.uint8)),
+                      'free': writer.add(np.array(allocator.free, np.int64))},
+        'archetypes': archetypes,
+    }
+    writer.write(path, header)
+    return path
+
+
+class Snapshot:
+    """### Snapshot ###
+
+  a snapshot file mapped into memory, arrays read from it point into the mapping instead of being loaded
+
+    >>> Snapshot(path)
+        maps the file copy on write, writes to loaded arrays never reach the file
+    >>> array(block)
+        returns the array a header block points to
+    >>> tables()
+        yields (entity ids, {component type: saved column}) for every archetype table in the file
+    >>> restore()
+        loads the snapshot into the empty world, returns the number of entities loaded,
+        every loaded entity gets an Entity handle and its components are attached like new ones
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.map = np.memmap(path, np.uint8, 'c')
+        if bytes(self.map[:len(MAGIC)]) != MAGIC:
+            raise CoreException(self, f"{path} is not a snapshot", path)
+        version = int(self.map[8:12].view(np.uint32)[0])
+        if version != VERSION:
+            raise CoreException(self, f"snapshot version {version} can't be read, expected {VERSION}", path)
+        length = int(self.map[12:20].view(np.uint64)[0])
+        self.header = json.loads(bytes(self.map[20:20 + length]))
+        self.start = -(-(20 + length) // ALIGNMENT) * ALIGNMENT
+
+    def array(self, block):
+        dtype = np.dtype([tuple(f) for f in block['dtype']] if isinstance(block['dtype'], list) else block['dtype'])
+        shape = tuple(block['shape'])
+        offset = self.start + block['offset']
+        return self.map[offset:offset + int(np.prod(shape)) * dtype.itemsize].view(dtype).reshape(shape)
+
+    def objects(self, block):
+        return pickle.loads(self.array(block).tobytes())
+
+    def tables(self):
+        for table in self.header['archetypes']:
+            yield self.array(table['entities']), {_type(path): saved for path, saved in table['columns'].items()}
+
+    def _load(self, column, saved, entity_ids, tick):
+        component_type = column.component_type
+        if saved['kind'] == 'objects':
+            components = self.objects(saved['objects'])
+        else:
+            values = self.array(saved['block'])
+            names = saved['fields'] if saved['kind'] == 'array' else values.dtype.names
+            if isinstance(column, ArrayColumn):
+                if saved['kind'] == 'records' or tuple(names) != column.fields:
+                    values = np.stack([values[name] if saved['kind'] == 'records' else values[:, names.index(name)]
+                                       for name in column.fields], axis=1)
+                views = column.load(values, entity_ids, tick)
+                # views only need their hook run when the type does more on attach than store its entity
+                if component_type.__attach__ is not Component.__attach__:
+                    for entity_id, view in zip(entity_ids, views):
+                        view.__attach__(entity_id)
+                return views
+            rows = values.tolist()
+            components = [component_type(**dict(zip(names, row))) for row in rows]
+            if 'objects' in saved:
+                for component, other in zip(components, self.objects(saved['objects'])):
+                    for name, value in other.items():
+                        setattr(component, name, value)
+        for entity_id, component in zip(entity_ids, components):
+            column.append(component, tick, tick)
+            component.__attach__(entity_id)
+
+    def restore(self):
+        if len(storage) or len(allocator):
+            raise CoreException(self, "snapshots can only be loaded into an empty world", self.path)
+        saved = self.header['allocator']
+        allocator.generations = self.array(saved['generations']).tolist()
+        allocator.alive = bytearray(self.array(saved['alive']).tobytes())
+        allocator.free = self.array(saved['free']).tolist()
+        tick = storage.tick
+        for entity_ids, columns in self.tables():
+            entity_ids = entity_ids.tolist()
+            archetype = storage.archetype(frozenset(columns))
+            for component_type, saved in columns.items():
+                self._load(archetype.columns[component_type], saved, entity_ids, tick)
+            archetype.entities.extend(entity_ids)
+            storage.locations.update(zip(entity_ids, zip(repeat(archetype), range(len(entity_ids)))))
+            for entity_id in entity_ids:
+                Entity.from_id(entity_id)
+        return len(storage)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.path!r})[tables={len(self.header['archetypes'])}]"
+
+
+def load(path):
+    """
+    maps the snapshot at path and loads it into the empty world
+    :return: the Snapshot, it must be kept while the world uses its arrays
+    """
+    snapshot = Snapshot(path)
+    snapshot.restore()
+    return snapshot
@@ -0,0 +1,429 @@
+from contextlib import contextmanager
+from itertools import count, repeat
+from threading import local
+
+from core.core_query import Query
+from core.core_registry import registry
+
+__doc__ = """### Core Storage ###
+
+ script for the archetype storage engine, entities that share the same set of
+ components share a table (Archetype) and every component type is a dense column
+ in that table, so systems can scan rows linearly instead of probing dicts
+
+"""
+
+
+class Column:
+    """### Column ###
+
+  dense column holding every component of a single type inside an Archetype,
+  rows line up with the entity list of the owning Archetype, every row also
+  records the storage tick it was added at and the tick it was last changed at
+
+    >>> append(component, added, changed)
+        adds the component as a new row with its ticks, returns the component that is now stored
+    >>> extend(components, tick)
+        adds a row for every component stamped with tick, returns the components that are now stored
+    >>> get(row)
+        returns the component stored at row
+    >>> set(row, component, tick)
+        replaces the component stored at row, returns the component that is now stored
+    >>> swap_remove(row)
+        removes row by moving the last row into its place
+    >>> ticks(row)
+        returns (added tick, changed tick) of row
+    >>> mark_changed(row, tick) / mark_all_changed(tick, rows)
+        sets the changed tick of one row, of every row or of the given rows
+    >>> changed_since(tick) / added_since(tick)
+        returns the rows changed or added after tick
+
+    """
+    __slots__ = ('component_type', 'data', 'added', 'changed')
+
+    def __init__(self, component_type):
+        self.component_type = component_type
+        self.data = []
+        self.added = []
+        self.changed = []
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def append(self, component, added=0, changed=0):
+        self.data.append(component)
+        self.added.append(added)
+        self.changed.append(changed)
+        return component
+
+    def extend(self, components, tick=0):
+        ticks = [tick] * len(components)
+        self.data.extend(components)
+        self.added.extend(ticks)
+        self.changed.extend(ticks)
+        return components
+
+    def get(self, row):
+        return self.data[row]
+
+    def set(self, row, component, tick=0):
+        self.data[row] = component
+        self.added[row] = self.changed[row] = tick
+        return component
+
+    def swap_remove(self, row):
+        for values in (self.data, self.added, self.changed):
+            last = values.pop()
+            if row < len(values):
+                values[row] = last
+
+    def ticks(self, row):
+        return self.added[row], self.changed[row]
+
+    def mark_changed(self, row, tick):
+        self.changed[row] = tick
+
+    def mark_all_changed(self, tick, rows=None):
+        changed = self.changed
+        for row in range(len(changed)) if rows is None else rows:
+            changed[row] = tick
+
+    def changed_since(self, tick):
+        return [row for row, changed in enumerate(self.changed) if changed > tick]
+
+    def added_since(self, tick):
+        return [row for row, added in enumerate(self.added) if added > tick]
+
+
+class Archetype:
+    """### Archetype ###
+
+  table of every entity that has exactly the same set of component types,
+  each component type gets a Column and row n of every column belongs to entities[n],
+  mask is the bitmask of the component ids in the signature
+
+    >>> Archetype(signature, column_factory)
+        signature = frozenset of component types stored in this table
+        column_factory = callable that takes a component type and returns an empty column
+
+    >>> append(entity_id, components, tick, carried)
+        adds a row, components is a dict of {component type: component}, returns the row index,
+        new components are stamped with tick, carried is a dict of {component type: (added, changed)}
+        for components that keep their ticks
+    >>> swap_remove(row)
+        removes a row, returns the id of the entity that was moved into it or None
+
+    """
+    __slots__ = ('signature', 'mask', 'types', 'names', 'entities', 'columns', 'add_edges', 'remove_edges')
+
+    def __init__(self, signature, column_factory=Column):
+        self.signature = signature
+        self.mask = registry.mask(signature)
+        self.types = tuple(sorted(signature, key=lambda t: (t.__name__, t.__module__)))
+        # {class name: component type}, names shared by several types in the table map to None
+        self.names = {}
+        for t in self.types:
+            self.names[t.__name__] = None if t.__name__ in self.names else t
+        self.entities = []
+        self.columns = {t: column_factory(t) for t in self.types}
+        # cached transitions to neighbouring archetypes, {component type: Archetype}
+        self.add_edges = {}
+        self.remove_edges = {}
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __contains__(self, component_type):
+        return component_type in self.columns
+
+    def append(self, entity_id, components, tick=0, carried=None):
+        for component_type, column in self.columns.items():
+            added, changed = carried[component_type] if carried and component_type in carried else (tick, tick)
+            components[component_type] = column.append(components[component_type], added, changed)
+        self.entities.append(entity_id)
+        return len(self.entities) - 1
+
+    def swap_remove(self, row):
+        for column in self.columns.values():
+            column.swap_remove(row)
+        entities = self.entities
+        last = entities.pop()
+        if row < len(entities):
+            entities[row] = last
+            return last
+        return None
+
+    def row(self, row):
+        return {t: column.get(row) for t, column in self.columns.items()}
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({[t.__name__ for t in self.types]})[entities={len(self)}]"
+
+
+class ArchetypeStorage:
+    """### ArchetypeStorage ###
+
+  owns every Archetype and knows which table and row each entity lives in,
+  attaching or detaching components moves the entity to the matching table in one step
+
+    >>> insert(entity_id, components)
+        attaches a list of component objects keyed by their component_type, returns the stored components
+    >>> insert_many(entity_ids, columns)
+        adds new entities straight to the table of columns, a dict of {component type: rows}, rows are
+        what the table's column takes in extend, returns {component type: stored components}
+    >>> remove(entity_id, component_types)
+        detaches components by type, returns the removed components
+    >>> delete(entity_id)
+        removes the entity and all its components, returns the removed components
+    >>> get(entity_id, component_type)
+        returns the component or None
+    >>> archetypes_with(*component_types)
+        yields every non empty Archetype storing at least the given types
+    >>> rows(*component_types)
+        yields (entity_id, component_a, component_b, ...) for every entity with all the types
+    >>> query(*required, optional=(), excluded=(), changed=(), added=())
+        returns the cached Query for those arguments, creating and registering it if needed
+    >>> mask_of(entity_id)
+        returns the component bitmask of the entity, 0 if it has no components
+    >>> register_column(component_type, column_factory)
+        stores component_type (and its subclasses) using a custom column type, existing rows are moved over
+
+  change detection, world_tick is a counter that is advanced by systems as they run, attached components are
+  stamped with the current tick and written components are stamped by mark_changed
+
+    >>> tick
+        the tick writes are stamped with, the tick of the stamping block the calling thread is in,
+        world_tick outside of one
+    >>> next_tick()
+        advances and returns world_tick
+    >>> stamping(tick)
+        context manager, writes made on the calling thread inside it are stamped with tick,
+        systems run inside one so systems running side by side each stamp their own tick
+    >>> mark_changed(entity_id, component_type)
+        stamps the component as changed at the current tick
+    >>> removed_since(component_type, tick)
+        returns the ids of entities that lost a component of that type after tick
+    >>> trim_removed(tick)
+        forgets removals at or before tick, once every reader has seen them
+
+  structural_changes counts every time an entity moved between tables or was deleted,
+  while journal is a list every component attached or removed is appended to it as
+  ('attach' or 'remove', entity_id, component type)
+
+    """
+
+    def __init__(self):
+        self.archetypes = {}
+        self.locations = {}
+        self.column_factories = {}
+        self.queries = {}
+        self.removed = {}
+        self.structural_changes = 0
+        self.journal = None
+        self.ticks = count(1)
+        self.world_tick = next(self.ticks)
+        self.stamps = local()
+        self.empty = self.archetype(frozenset())
+
+    @property
+    def tick(self):
+        tick = getattr(self.stamps, 'tick', None)
+        return self.world_tick if tick is None else tick
+
+    def next_tick(self):
+        self.world_tick = next(self.ticks)
+        return self.world_tick
+
+    @contextmanager
+    def stamping(self, tick):
+        previous = getattr(self.stamps, 'tick', None)
+        self.stamps.tick = tick
+        try:
+            yield
+        finally:
+            self.stamps.tick = previous
+
+    def mark_changed(self, entity_id, component_type):
+        location = self.locations.get(entity_id)
+        if location is not None:
+            column = location[0].columns.get(component_type)
+            if column is not None:
+                column.mark_changed(location[1], self.tick)
+
+    def _removed(self, entity_id, component_types):
+        tick = self.tick
+        for component_type in component_types:
+            self.removed.setdefault(component_type, []).append((tick, entity_id))
+        if self.journal is not None:
+            self.journal.extend(('remove', entity_id, component_type) for component_type in component_types)
+
+    def removed_since(self, component_type, tick):
+        return [entity_id for removed, entity_id in self.removed.get(component_type, ()) if removed > tick]
+
+    def trim_removed(self, tick):
+        for component_type, removed in self.removed.items():
+            self.removed[component_type] = [entry for entry in removed if entry[0] > tick]
+
+    def column_factory(self, component_type):
+        for base in component_type.__mro__:
+            if base in self.column_factories:
+                return self.column_factories[base](component_type)
+        return Column(component_type)
+
+    def register_column(self, component_type, column_factory):
+        self.column_factories[component_type] = column_factory
+        # existing tables are rebuilt so every row of the type ends up in the new kind of column
+        for archetype in self.archetypes.values():
+            for t, old in archetype.columns.items():
+                if issubclass(t, component_type):
+                    column = archetype.columns[t] = self.column_factory(t)
+                    for row, component in enumerate(old):
+                        column.append(component, *old.ticks(row))
+
+    def archetype(self, signature):
+        # tables are keyed by their component bitmask
+        mask = registry.mask(signature)
+        archetype = self.archetypes.get(mask)
+        if archetype is None:
+            archetype = self.archetypes[mask] = Archetype(signature, self.column_factory)
+            for query in self.queries.values():
+                query.__archetype__(archetype)
+        return archetype
+
+    def query(self, *required, optional=(), excluded=(), changed=(), added=()):
+        key = (tuple(required), tuple(optional), frozenset(excluded), frozenset(changed), frozenset(added))
+        query = self.queries.get(key)
+        if query is None:
+            query = self.queries[key] = Query(*required, optional=optional, excluded=excluded,
+                                              changed=changed, added=added)
+            for archetype in self.archetypes.values():
+                query.__archetype__(archetype)
+        return query
+
+    def _with(self, archetype, component_type):
+        target = archetype.add_edges.get(component_type)
+        if target is None:
+            target = archetype.add_edges[component_type] = self.archetype(archetype.signature | {component_type})
+        return target
+
+    def _without(self, archetype, component_type):
+        target = archetype.remove_edges.get(component_type)
+        if target is None:
+            target = archetype.remove_edges[component_type] = self.archetype(archetype.signature - {component_type})
+        return target
+
+    def _move(self, entity_id, source, row, target, added):
+        carried = {t: source.columns[t].ticks(row) for t in target.types if t not in added}
+        components = {t: source.columns[t].get(row) for t in carried}
+        components.update(added)
+        new_row = target.append(entity_id, components, self.tick, carried)
+        moved = source.swap_remove(row)
+        if moved is not None:
+            self.locations[moved] = (source, row)
+        self.locations[entity_id] = (target, new_row)
+        self.structural_changes += 1
+        return components
+
+    def insert(self, entity_id, components):
+        source, row = self.locations.get(entity_id) or (None, None)
+        if source is None:
+            source = self.empty
+            row = source.append(entity_id, {}, self.tick)
+            self.locations[entity_id] = (source, row)
+        added = {component.component_type: component for component in components}
+        new = [t for t in added if t not in source]
+        if self.journal is not None:
+            self.journal.extend(('attach', entity_id, component_type) for component_type in new)
+        if not new:
+            target = source
+        elif len(new) == 1:
+            target = self._with(source, new[0])
+        else:
+            target = self.archetype(source.signature.union(new))
+        if target is source:
+            columns = source.columns
+            return [columns[t].set(row, component, self.tick) for t, component in added.items()]
+        stored = self._move(entity_id, source, row, target, added)
+        return [stored[t] for t in added]
+
+    def insert_many(self, entity_ids, columns):
+        archetype = self.archetype(frozenset(columns))
+        start, tick = len(archetype), self.tick
+        stored = {t: column.extend(columns[t], tick) for t, column in archetype.columns.items()}
+        archetype.entities.extend(entity_ids)
+        self.locations.update(zip(entity_ids, zip(repeat(archetype), range(start, start + len(entity_ids)))))
+        self.structural_changes += len(entity_ids)
+        if self.journal is not None:
+            self.journal.extend(('attach', entity_id, t) for entity_id in entity_ids for t in archetype.types)
+        return stored
+
+    def remove(self, entity_id, component_types):
+        source, row = self.locations[entity_id]
+        gone = [t for t in dict.fromkeys(component_types) if t in source]
+        removed = [source.columns[t].get(row) for t in gone]
+        if len(gone) == 1:
+            target = self._without(source, gone[0])
+        elif gone:
+            target = self.archetype(source.signature.difference(gone))
+        else:
+            target = source
+        if target is not source:
+            self._move(entity_id, source, row, target, {})
+            self._removed(entity_id, gone)
+        return removed
+
+    def delete(self, entity_id):
+        location = self.locations.pop(entity_id, None)
+        if location is None:
+            return []
+        source, row = location
+        removed = [column.get(row) for column in source.columns.values()]
+        self._removed(entity_id, source.types)
+        self.structural_changes += 1
+        moved = source.swap_remove(row)
+        if moved is not None:
+            self.locations[moved] = (source, row)
+        return removed
+
+    def __contains__(self, entity_id):
+        return entity_id in self.locations
+
+    def get(self, entity_id, component_type):
+        archetype, row = self.locations[entity_id]
+        column = archetype.columns.get(component_type)
+        return column.get(row) if column is not None else None
+
+    def get_by_name(self, entity_id, name):
+        archetype, row = self.locations[entity_id]
+        component_type = archetype.names.get(name)
+        if component_type is None and name in archetype.names:
+            raise KeyError(f"Entity#{entity_id} has several components named {name}, look them up by type")
+        return archetype.columns[component_type].get(row) if component_type is not None else None
+
+    def mask_of(self, entity_id):
+        location = self.locations.get(entity_id)
+        return location[0].mask if location is not None else 0
+
+    def components_of(self, entity_id):
+        location = self.locations.get(entity_id)
+        if location is None:
+            return {}
+        archetype, row = location
+        return archetype.row(row)
+
+    def archetypes_with(self, *component_types):
+        for archetype in tuple(self.archetypes.values()):
+            if archetype.entities and all(t in archetype.columns for t in component_types):
+                yield archetype
+
+    def rows(self, *component_types):
+        return iter(self.query(*component_types))
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(archetypes={len(self.archetypes)}, entities={len(self)})"
@@ -0,0 +1,137 @@
+import math
+
+from core.core_objects import CoreException
+
+__doc__ = """### Core Timers ###
+
+ script for the hierarchical timer wheel, timers are dropped into slots by the tick they are due on
+ instead of being counted down one by one, advancing the wheel only looks at the slot of each tick
+ passed, so finding what expired costs time in the number of timers that expired, not the number waiting
+
+"""
+
+
+class TimerWheel:
+    """### TimerWheel ###
+
+  levels of slots, a timer due within slots ticks sits in the first level, one due within slots ** 2 ticks
+  in the second and so on, every time a level wraps around the next slot of the level above is
+  spread over the levels below, timers further away than every level covers wait in the last one
+
+    >>> TimerWheel(resolution, slots, levels)
+        resolution = seconds per tick, timers are rounded up to whole ticks
+        slots = slots per level, a power of two
+        levels = number of levels, slots ** levels ticks are covered before timers have to wait
+
+    >>> schedule(key, delay)
+        key is due in delay seconds, a key that is already scheduled is moved, returns the tick it is due on
+    >>> cancel(key) / cancel_many(keys)
+        removes keys from the wheel, returns how many were scheduled
+    >>> advance(elapsed)
+        moves the wheel elapsed seconds on, returns the keys that became due in the order they were due
+    >>> remaining(key)
+        seconds until key is due, None if it isn't scheduled
+
+    """
+
+    def __init__(self, resolution=1. / 60., slots=64, levels=4):
+        if slots & (slots - 1):
+            raise CoreException(self, f"slots must be a power of two, got {slots}", slots)
+        self.resolution = resolution
+        self.bits = slots.bit_length() - 1
+        self.mask = slots - 1
+        self.span = 1 << (self.bits * levels)
+        # wheels[level][slot] = {key: tick due}
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        # {key: (slot dict holding it, tick due)}
+        self.timers = {}
+        self.now = 0
+        self.time = 0.
+
+    def _place(self, key, due):
+        delta = min(max(due - self.now, 0), self.span - 1)
+        target = self.now + delta
+        level = 0
+        while delta >> (self.bits * (level + 1)):
+            level += 1
+        slot = self.wheels[level][(target >> (self.bits * level)) & self.mask]
+        slot[key] = due
+        self.timers[key] = (slot, due)
+
+    def schedule(self, key, delay):
+        self.cancel(key)
+        due = self.now + max(math.ceil(delay / self.resolution - 1e-9), 1)
+        self._place(key, due)
+        return due
+
+    def cancel(self, key):
+        timer = self.timers.pop(key, None)
+        if timer is None:
+            return 0
+        del timer[0][key]
+        return 1
+
+    def cancel_many(self, keys):
+        timers = self.timers
+        cancelled = 0
+        for key in keys:
+            timer = timers.pop(key, None)
+            if timer is not None:
+                del timer[0][key]
+                cancelled += 1
+        return cancelled
+
+    def _cascade(self, level):
+        # the slot of this level that just came into range is spread over the levels below
+        index = (self.now >> (self.bits * level)) & self.mask
+        slot = self.wheels[level][index]
+        if slot:
+            self.wheels[level][index] = {}
+            for key, due in slot.items():
+                self._place(key, due)
+        return index
+
+    def advance(self, elapsed):
+        self.time += elapsed
+        target = int(self.time / self.resolution + 1e-9)
+        expired = []
+        if not self.timers:
+            self.now = max(self.now, target)
+            return expired
+        wheel = self.wheels[0]
+        while self.now < target:
+            self.now += 1
+            index = self.now & self.mask
+            if not index:
+                level = 1
+                while level < len(self.wheels) and not self._cascade(level):
+                    level += 1
+            slot = wheel[index]
+            if slot:
+                wheel[index] = {}
+                for key, due in slot.items():
+                    if due > self.now:
+                        # further away than the wheel covers, waits another lap
+                        self._place(key, due)
+                    else:
+                        del self.timers[key]
+                        expired.append(key)
+            if not self.timers:
+                self.now = target
+        return expired
+
+    def remaining(self, key):
+        timer = self.timers.get(key)
+        if timer is None:
+            return None
+        return (timer[1] - self.now) * self.resolution
+
+    def __contains__(self, key):
+        return key in self.timers
+
+    def __len__(self):
+        return len(self.timers)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(resolution={self.resolution}, levels={len(self.wheels)})" \
+               f"[timers={len(self)}, now={self.now}]"
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+__doc__ = """### Core Trace ###
+
+ script for frame instrumentation, the tracer records how long every system takes, how many
+ entities its query matched and how many structural changes each frame made, callers check
+ tracer.enabled once and skip every timing call while it is off, so tracing costs nothing by default
+
+"""
+
+
+class Tracer:
+    """### Tracer ###
+
+  records timed spans and counters as Chrome trace events, the export loads in chrome://tracing and Perfetto
+
+    >>> Tracer(capacity)
+        capacity = the most events kept, older events are dropped so a long running game doesn't grow forever
+
+    >>> enable() / disable()
+        turns recording on or off, the Scheduler checks enabled once per tick
+    >>> timed(name, function, category, **args)
+        returns function wrapped to record a span of its wall and CPU time on the thread it runs on
+    >>> span(name, category, **args)
+        context manager recording a span around a block, does nothing while disabled
+    >>> record(name, start, wall, cpu, category, **args)
+        records a finished span, start is a time.perf_counter() reading, wall and cpu are seconds
+    >>> counter(name, **values)
+        records counter values at the current time, shown as a graph by the trace viewers
+    >>> summary()
+        returns {name: {calls, wall, cpu, max, mean}} for every span name, slowest total wall time first
+    >>> export(path)
+        writes the recorded events as Chrome trace JSON
+    >>> clear()
+        forgets every recorded event and statistic
+
+    """
+
+    def __init__(self, capacity=100000):
+        self.enabled = False
+        self.events = deque(maxlen=capacity)
+        self.stats = {}
+        self.threads = {}
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+        return self
+
+    def disable(self):
+        self.enabled = False
+        return self
+
+    def clear(self):
+        with self.lock:
+            self.events.clear()
+            self.stats.clear()
+
+    def _thread(self):
+        thread = threading.current_thread()
+        self.threads[thread.ident] = thread.name
+        return thread.ident
+
+    def record(self, name, start, wall, cpu=None, category='span', **args):
+        if cpu is not None:
+            args['cpu_ms'] = cpu * 1e3
+        self.events.append({'name': name, 'cat': category, 'ph': 'X', 'pid': self.pid, 'tid': self._thread(),
+                            'ts': (start - self.origin) * 1e6, 'dur': wall * 1e6, 'args': args})
+        with self.lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = [0, 0., 0., 0.]
+            stat[0] += 1
+            stat[1] += wall
+            stat[2] += cpu or 0.
+            stat[3] = max(stat[3], wall)
+
+    def timed(self, name, function, category='span', **args):
+        def timed(*f_args, **f_kwargs):
+            start, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return function(*f_args, **f_kwargs)
+            finally:
+                self.record(name, start, time.perf_counter() - start, time.thread_time() - cpu, category, **args)
+
+        return timed
+
+    @contextmanager
+    def span(self, name, category='span', **args):
+        if not self.enabled:
+            yield
+            return
+        start, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start, time.thread_time() - cpu, category, **args)
+
+    def counter(self, name, **values):
+        self.events.append({'name': name, 'ph': 'C', 'pid': self.pid, 'tid': self._thread(),
+                            'ts': (time.perf_counter() - self.origin) * 1e6, 'args': values})
+
+    def summary(self):
+        with self.lock:
+            stats = sorted(self.stats.items(), key=lambda item: item[1][1], reverse=True)
+        return {name: {'calls': calls, 'wall': wall, 'cpu': cpu, 'max': longest, 'mean': wall / calls}
+                for name, (calls, wall, cpu, longest) in stats}
+
+    def export(self, path):
+        threads = [{'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': ident, 'args': {'name': name}}
+                   for ident, name in tuple(self.threads.items())]
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': threads + list(self.events), 'displayTimeUnit': 'ms'}, file)
+        return path
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(enabled={self.enabled})[events={len(self.events)}, spans={len(self.stats)}]"
+
+
+tracer = Tracer()
@@ -1,5 +1,9 @@
 from enum import Enum, auto
 
+from events.events_bus import Event, EventBus, EventChannel
+
+__all__ = ['ButtonStates', 'Event', 'EventBus', 'EventChannel']
+
 
 class ButtonStates(Enum):
     DEFAULT = auto()
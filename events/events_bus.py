@@ -0,0 +1,162 @@
+from dataclasses import fields, is_dataclass
+from threading import Lock
+
+import numpy as np
+
+__doc__ = """### Events Bus ###
+
+ script for the event bus, every event type gets a preallocated ring buffer of
+ NumPy records, emitting writes straight into the buffer and once per frame the
+ events are handed to subscribers as a single batch
+
+"""
+
+_field_dtypes = {int: np.int64, float: np.float64, bool: np.bool_, 'int': np.int64, 'float': np.float64,
+                 'bool': np.bool_}
+
+
+class Event:
+    """### Event ###
+
+  base for event declarations, an event type is a dataclass whose fields make up its payload,
+  int, float and bool fields are stored as plain numbers, any other field is stored as an object
+
+    >>> @dataclass
+    >>> class Collision(Event):
+    >>>     a: int = 0
+    >>>     b: int = 0
+    >>>     impulse: float = 0.
+
+  events are emitted as values, Collision objects are never created by the bus
+
+    """
+
+    @classmethod
+    def dtype(cls):
+        if not is_dataclass(cls):
+            raise TypeError(f"{cls.__name__} must be a dataclass to be used as an Event")
+        return np.dtype([(f.name, _field_dtypes.get(f.type, object)) for f in fields(cls)])
+
+
+class EventChannel:
+    """### EventChannel ###
+
+  ring buffer of one event type, events emitted this frame are pending and are published as a batch
+  by publish(), the published batch stays readable until the next publish
+
+    """
+    __slots__ = ('event_type', 'buffer', 'capacity', 'head', 'start', 'end', 'dropped', 'lock', 'subscribers')
+
+    def __init__(self, event_type, capacity):
+        self.event_type = event_type
+        self.buffer = np.zeros(capacity, event_type.dtype())
+        self.capacity = capacity
+        self.head = 0  # total events written
+        self.start = self.end = 0  # published batch is [start, end)
+        self.dropped = 0
+        self.lock = Lock()
+        self.subscribers = []
+
+    def reserve(self, count):
+        # returns the first index of count free slots, or None if they would overwrite the published batch
+        with self.lock:
+            if self.head + count - self.start > self.capacity:
+                self.dropped += count
+                return None
+            head = self.head
+            self.head += count
+            return head
+
+    def emit(self, values):
+        head = self.reserve(1)
+        if head is not None:
+            self.buffer[head % self.capacity] = values
+
+    def emit_many(self, count, columns):
+        head = self.reserve(count)
+        if head is None:
+            return
+        first = head % self.capacity
+        split = min(count, self.capacity - first)
+        for name, values in columns.items():
+            values = np.broadcast_to(values, (count,))
+            self.buffer[name][first:first + split] = values[:split]
+            self.buffer[name][:count - split] = values[split:]
+
+    def publish(self):
+        with self.lock:
+            self.start, self.end = self.end, self.head
+
+    def batch(self):
+        first, count = self.start % self.capacity, self.end - self.start
+        if first + count <= self.capacity:
+            return self.buffer[first:first + count]
+        return np.concatenate((self.buffer[first:], self.buffer[:first + count - self.capacity]))
+
+
+class EventBus:
+    """### EventBus ###
+
+  typed event bus, events are written into preallocated ring buffers and delivered once per frame
+
+    >>> register(event_type, capacity)
+        creates the ring buffer for an Event dataclass, capacity is the most events that can be
+        pending plus published at once, events past that are dropped and counted
+    >>> emit(event_type, *values)
+        writes one event, values are in field order
+    >>> emit_many(event_type, **columns)
+        writes a batch of events from arrays (or single values broadcast to every event) per field
+    >>> subscribe(event_type, callback)
+        callback(batch) is called by deliver() with every frame's events that aren't empty
+    >>> deliver()
+        publishes the events emitted since the last deliver and hands them to subscribers,
+        the Scheduler calls this at the end of every tick when given the bus
+    >>> read(event_type)
+        returns the last delivered batch as a NumPy record array, fields are read as batch['name']
+
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.channels = {}
+
+    def register(self, event_type, capacity=None):
+        channel = self.channels.get(event_type)
+        if channel is None:
+            channel = self.channels[event_type] = EventChannel(event_type, capacity or self.capacity)
+        return channel
+
+    def channel(self, event_type):
+        channel = self.channels.get(event_type)
+        return channel if channel is not None else self.register(event_type)
+
+    def emit(self, event_type, *values):
+        self.channel(event_type).emit(values)
+
+    def emit_many(self, event_type, count=None, **columns):
+        if count is None:
+            count = max((len(values) for values in columns.values() if np.ndim(values)), default=1)
+        self.channel(event_type).emit_many(count, columns)
+
+    def subscribe(self, event_type, callback):
+        self.channel(event_type).subscribers.append(callback)
+
+    def unsubscribe(self, event_type, callback):
+        self.channel(event_type).subscribers.remove(callback)
+
+    def deliver(self):
+        for channel in tuple(self.channels.values()):
+            channel.publish()
+            if channel.subscribers and channel.end > channel.start:
+                batch = channel.batch()
+                for callback in channel.subscribers:
+                    callback(batch)
+
+    def read(self, event_type):
+        return self.channel(event_type).batch()
+
+    def dropped(self, event_type):
+        return self.channel(event_type).dropped
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({[t.__name__ for t in self.channels]})"
@@ -2,7 +2,7 @@ import common
 import core
 import events
 import prefabs
-from core import Entity, Component, System, CoreException
+from core import Entity, Component, System, CoreException, Scheduler
 
 __doc__ = "\n\r" f"""### {common.__PROJECT_NAME__}: {common.__VERSION_STR__} ###
 
@@ -15,7 +15,7 @@ __doc__ = "\n\r" f"""### {common.__PROJECT_NAME__}: {common.__VERSION_STR__} ###
  
 """
 
-__all__ = ['common', 'events', 'prefabs', 'Entity', 'Component', 'System', 'CoreException', "docs"]
+__all__ = ['common', 'events', 'prefabs', 'Entity', 'Component', 'System', 'CoreException', 'Scheduler', "docs"]
 
 __todo__ = """
 ## TODO ###
@@ -31,20 +31,6 @@ __todo__ = """
             can be compiled to machine code for faster calls, things like vector math would be good 
             candidates for JIT
         
-   * write core thread manager
-        - I think this would work best as an async context manager, 
-            we can send the list of systems to manage as an arg, 
-            and then we can cleanly shut down those systems on exit
-        
-   * write core event manager
-        - I feel this also need to be an threaded process, but more study needs to be done
-        
-   * core clock
-        - should be able to supply any tick rate requested, supply time since last tick etc
-            I think there should be a global clock, and this ticks the other clocks at requested 
-            intervals this way we can have different things support different tick rates while 
-            maintaining synchronicity
-
 
 * ### Math ### 
    * various curves, waves and linear functions
@@ -81,8 +67,6 @@ __todo__ = """
    * shader engine
         - I'd like to try my hand at a light weight shader system, much study needs to 
             go into this though
-   * particle engine
-        - same as the above really, but for particles
 
 
 * ### Mesh Management ###
@@ -110,7 +94,7 @@ __todo__ = """
 
 
 def docs():
-    return __doc__ + core.core_objects.__doc__ + common.__doc__
+    return __doc__ + core.docs() + common.__doc__
 
 
 if __name__ == "__main__":
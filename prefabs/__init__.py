@@ -1,8 +1,43 @@
+import importlib
 from dataclasses import dataclass, field
 from enum import Enum
+from functools import cache
 
 import common
-from core import Component, System
+from core import Component, System, Column
+from core.core_objects import storage
+
+# prebuilt subsystems live in prefabs_<name> submodules that are only imported the first time
+# one of their names is used, {exported name: submodule name}
+_submodules = {
+    'SpatialGrid': 'prefabs_spatial', 'KDTree': 'prefabs_spatial', 'SpatialIndexSystem': 'prefabs_spatial',
+    'RenderSystem': 'prefabs_render', 'RenderBatch': 'prefabs_render',
+    'LifetimeSystem': 'prefabs_lifetime',
+    'SteeringSystem': 'prefabs_ai', 'FollowSystem': 'prefabs_ai', 'FleeSystem': 'prefabs_ai',
+    'HostileSystem': 'prefabs_ai', 'AmbientSystem': 'prefabs_ai',
+    'ParticleSystem': 'prefabs_particles', 'ParticleEmitter': 'prefabs_particles',
+    'ParticlePool': 'prefabs_particles', 'Curve': 'prefabs_particles',
+}
+
+# the lazy names are listed too, so from prefabs import * imports their submodules
+__all__ = ['Vectored', 'Position', 'Rotation', 'Velocity', 'Transform', 'Mass', 'Mesh', 'Scale', 'Light', 'Glow',
+           'Opacity', 'Colour', 'Name', 'Value', 'Tradable', 'Inventory', 'WeightedInventory', 'SlottedInventory',
+           'Pane', 'Label', 'Lifetime', 'Audio', 'AudioClip', 'AudioLoop', 'AudioInterval', 'SteeringAI', 'FollowAI',
+           'FleeAI', 'HostileAI', 'AmbientAI', 'DefaultLivingCreatures', 'MotionSystem', 'AudioSystem',
+           'TransformSystem', 'enable_columnar', 'docs', *_submodules]
+
+
+def __getattr__(name):
+    submodule = _submodules.get(name)
+    if submodule is not None:
+        return getattr(importlib.import_module(f"{__name__}.{submodule}"), name)
+    if name.startswith(f"{__name__}_"):
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted({*globals(), *_submodules})
 
 
 @dataclass(**common.default_dataclass_args)
@@ -16,7 +51,7 @@ class Vectored(Component):
         return self.x, self.y, self.z
 
     def set_value(self, vector):
-        self.x, self.y, self.x = vector
+        self.x, self.y, self.z = vector
 
 
 @dataclass(**common.default_dataclass_args)
@@ -36,6 +71,21 @@ class Transform(Vectored):
     pass
 
 
+def enable_columnar(dtype='float64', shared=False):
+    """
+    opt-in columnar mode, every Vectored component (Position, Rotation, Velocity, Transform) is stored
+    in an ArrayColumn of x, y, z rows and the component objects become views into that array,
+    components that are already attached are moved over
+    :param dtype: NumPy dtype of the columns, float32 or float64
+    :param shared: allocate the columns in shared memory so systems can run in worker processes
+    """
+    if shared:
+        from core.core_shared import SharedArrayColumn as column_type
+    else:
+        from core.core_columns import ArrayColumn as column_type
+    storage.register_column(Vectored, lambda component_type: column_type(component_type, ('x', 'y', 'z'), dtype))
+
+
 @dataclass(**common.default_dataclass_args)
 class Mass(Component):
     mass: float = field(default=1., **common.default_field_args)
@@ -188,6 +238,27 @@ class Label(Pane):
 @dataclass(**common.default_dataclass_args)
 class Lifetime(Component):
     time: float = field(default=100, **common.default_field_args)
+    # seconds the entity lives for from when it is attached, the time left is kept by the TimerWheel
+    # of the LifetimeSystem the component is scheduled on (see prefabs_lifetime), not counted down here
+    timers = None
+
+    def get_value(self):
+        return self.time
+
+    def set_value(self, time):
+        self.time = time
+        if self.entity_id is not None and self.timers is not None:
+            self.timers.schedule(self.entity_id, time)
+
+    def __attach__(self, entity_id):
+        Component.__attach__(self, entity_id)
+        if self.timers is not None:
+            self.timers.schedule(entity_id, self.time)
+
+    def __detach__(self):
+        if self.timers is not None:
+            self.timers.cancel(self.entity_id)
+        Component.__detach__(self)
 
 
 ############################################################################
@@ -220,23 +291,34 @@ class AudioInterval(Audio):
 ############################################################################
 
 @dataclass(**common.default_dataclass_args)
-class FollowAI(Component):
-    pass
+class SteeringAI(Component):
+    # speed is the fastest the agent moves, force the most its velocity changes per second,
+    # targets are entity ids, -1 for none, the steering systems live in prefabs_ai
+    speed: float = field(default=1., **common.default_field_args)
+    force: float = field(default=1., **common.default_field_args)
 
 
 @dataclass(**common.default_dataclass_args)
-class FleeAI(Component):
-    pass
+class FollowAI(SteeringAI):
+    target: int = field(default=-1, **common.default_field_args)
+    distance: float = field(default=2., **common.default_field_args)
 
 
 @dataclass(**common.default_dataclass_args)
-class HostileAI(Component):
-    pass
+class FleeAI(SteeringAI):
+    threat: int = field(default=-1, **common.default_field_args)
+    radius: float = field(default=10., **common.default_field_args)
 
 
 @dataclass(**common.default_dataclass_args)
-class AmbientAI(Component):
-    pass
+class HostileAI(SteeringAI):
+    target: int = field(default=-1, **common.default_field_args)
+    range: float = field(default=20., **common.default_field_args)
+
+
+@dataclass(**common.default_dataclass_args)
+class AmbientAI(SteeringAI):
+    jitter: float = field(default=.5, **common.default_field_args)
 
 
 ############################################################################
@@ -257,8 +339,34 @@ class DefaultLivingCreatures(Enum):
 
 
 class MotionSystem(System):
+    """### MotionSystem ###
+
+  moves every Position by its Velocity scaled by delta_time, tables stored in columnar mode
+  are integrated in one vectorized operation per table, only the Positions of entities with
+  a non zero Velocity are marked as changed
+
+    """
+
     def __init__(self):
-        super().__init__(Position, Rotation, Velocity)
+        super().__init__(Position, Rotation, Velocity, reads=(Rotation, Velocity), writes=(Position,))
+
+    def process(self, rows):
+        time_step = self.delta_time
+        for table in rows.tables():
+            positions, velocities = table.columns[Position], table.columns[Velocity]
+            if not isinstance(positions, Column) and not isinstance(velocities, Column):
+                position_array, velocity_array = positions.array, velocities.array
+                position_array += velocity_array * time_step
+                # or-ing the three columns is several times faster than any(axis=1) on narrow rows
+                moving = velocity_array != 0
+                positions.mark_all_changed(self.last_run, moving[:, 0] | moving[:, 1] | moving[:, 2])
+            else:
+                for row, (position, velocity) in enumerate(zip(positions, velocities)):
+                    if velocity.x or velocity.y or velocity.z:
+                        position.x += velocity.x * time_step
+                        position.y += velocity.y * time_step
+                        position.z += velocity.z * time_step
+                        positions.mark_changed(row, self.last_run)
 
 
 class AudioSystem(System):
@@ -269,13 +377,12 @@ class TransformSystem(System):
     pass
 
 
-class RenderSystem(System):
-    pass
-
-
 __doc__ = """ ### Prefabs ###
     Module that provides a bunch of prebuilt _components, archetypes and systems
 """
 
-for c in common.get_class_docs(__name__):
-    __doc__ += str(c)
+
+@cache
+def docs():
+    """:return: the module docs followed by the docs of every class in it, built the first time they are asked for"""
+    return __doc__ + "".join(str(c) for c in common.get_class_docs(__name__))
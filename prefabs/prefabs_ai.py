@@ -0,0 +1,226 @@
+import numpy as np
+
+from core import System, Column
+from core.core_objects import storage
+from prefabs import AmbientAI, FleeAI, FollowAI, HostileAI, Position, Velocity
+
+__doc__ = """### Prefabs AI ###
+
+ script for steering agents, a system per behaviour gathers the Position, Velocity and AI fields of
+ every agent due to re-plan into arrays, works out the velocity each one wants in a few array
+ operations and steers towards it, agents re-plan in time slices and far away agents less often
+
+"""
+
+
+def _vectors(column, rows):
+    # (len(rows), 3) array of a Vectored column, columnar tables are read straight from their array
+    if not isinstance(column, Column):
+        return column.array[rows].astype(np.float64)
+    return np.array([column.get(row).get_value() for row in rows.tolist()], np.float64).reshape(-1, 3)
+
+
+def _write(column, rows, vectors, tick):
+    if not isinstance(column, Column):
+        column.array[rows] = vectors
+    else:
+        for row, (x, y, z) in zip(rows.tolist(), vectors.tolist()):
+            component = column.get(row)
+            component.x, component.y, component.z = x, y, z
+    column.mark_all_changed(tick, rows)
+
+
+def _fields(column, rows, names):
+    return np.array([[getattr(component, name) for name in names] for component in map(column.get, rows.tolist())],
+                    np.float64).reshape(-1, len(names))
+
+
+def _lookup(entity_ids, component_type):
+    # vectors of a component of other entities, looked up once per distinct entity, nan where there is none
+    unique, inverse = np.unique(entity_ids, return_inverse=True)
+    found = np.full((len(unique), 3), np.nan)
+    for index, entity_id in enumerate(unique.tolist()):
+        location = storage.locations.get(entity_id)
+        if location is not None:
+            column = location[0].columns.get(component_type)
+            if column is not None:
+                found[index] = _vectors(column, np.array([location[1]]))[0]
+    return found[inverse]
+
+
+def _normalized(vectors, lengths=None):
+    if lengths is None:
+        lengths = np.linalg.norm(vectors, axis=1)
+    return vectors / np.where(lengths > 0, lengths, 1.)[:, None]
+
+
+class SteeringSystem(System):
+    """### SteeringSystem ###
+
+  base of the steering systems, processes every entity with a Position, a Velocity and the system's
+  behaviour component, subclasses set behaviour, the parameters they read from it and steer
+
+    >>> SteeringSystem(fraction, lod, focus)
+        fraction = share of the agents that re-plan each tick, 0.25 re-plans every agent every 4th tick
+        lod = (distance, multiplier) pairs, agents further than distance from focus re-plan
+            multiplier times less often, multipliers are whole numbers
+        focus = point the lod distances are measured from, usually the camera or the player,
+            update it whenever it moves, None turns lod off
+    >>> steer(positions, velocities, speeds, parameters)
+        returns the (n, 3) velocities the agents want, parameters is an (n, len(parameters)) array
+        of the behaviour fields named in parameters
+    >>> planned
+        the number of agents that re-planned in the last update
+
+  an agent steers towards the velocity it wants by at most force per second and never faster than
+  speed, a time sliced agent steers by everything it missed since it last re-planned, agents are
+  spread over the slices by entity id so the work per tick stays even
+
+    """
+
+    order = -10  # before MotionSystem integrates the velocities
+    behaviour = None
+    parameters = ()
+
+    def __init__(self, fraction=1., lod=(), focus=None):
+        super().__init__(Position, Velocity, self.behaviour, reads=(Position, self.behaviour), writes=(Velocity,))
+        self.interval = max(1, round(1. / fraction))
+        self.lod = tuple(sorted((distance, int(multiplier)) for distance, multiplier in lod))
+        self.focus = focus
+        self.frame = 0
+        self.planned = 0
+
+    def intervals(self, positions):
+        """:return: ticks between re-plans of agents at positions"""
+        intervals = np.full(len(positions), self.interval, np.int64)
+        if self.focus is not None and self.lod:
+            distances = np.linalg.norm(positions - np.asarray(self.focus, np.float64), axis=1)
+            for distance, multiplier in self.lod:
+                intervals[distances > distance] = self.interval * multiplier
+        return intervals
+
+    def steer(self, positions, velocities, speeds, parameters):
+        return velocities
+
+    def process(self, rows):
+        self.frame += 1
+        self.planned = 0
+        names = ('speed', 'force', *self.parameters)
+        for table in rows.tables():
+            columns = table.columns
+            entity_ids = np.asarray(table.entities, np.int64)
+            # lod intervals are multiples of the base interval, so only agents due this slice are looked at
+            due = np.flatnonzero((self.frame + entity_ids) % self.interval == 0)
+            if not len(due):
+                continue
+            positions = _vectors(columns[Position], due)
+            intervals = self.intervals(positions)
+            selected = (self.frame + entity_ids[due]) % intervals == 0
+            due, positions, intervals = due[selected], positions[selected], intervals[selected]
+            if not len(due):
+                continue
+            velocities = _vectors(columns[Velocity], due)
+            agents = _fields(columns[self.behaviour], due, names)
+            speeds, forces = agents[:, 0], agents[:, 1]
+            steering = self.steer(positions, velocities, speeds, agents[:, 2:]) - velocities
+            lengths = np.linalg.norm(steering, axis=1)
+            limits = forces * intervals * self.delta_time
+            steering *= np.minimum(1., limits / np.where(lengths > 0, lengths, 1.))[:, None]
+            velocities += steering
+            lengths = np.linalg.norm(velocities, axis=1)
+            velocities *= np.minimum(1., speeds / np.where(lengths > 0, lengths, 1.))[:, None]
+            _write(columns[Velocity], due, velocities, self.last_run)
+            self.planned += len(due)
+
+
+class FollowSystem(SteeringSystem):
+    """### FollowSystem ###
+
+  FollowAI agents head for their target at full speed, slow down inside twice the follow distance
+  and stop at the distance, agents whose target has no Position come to a stop
+
+    """
+
+    behaviour = FollowAI
+    parameters = ('target', 'distance')
+
+    def steer(self, positions, velocities, speeds, parameters):
+        offsets = _lookup(parameters[:, 0].astype(np.int64), Position) - positions
+        distances = np.linalg.norm(offsets, axis=1)
+        stops = parameters[:, 1]
+        ramps = np.clip((distances - stops) / np.where(stops > 0, stops, 1.), 0., 1.)
+        desired = _normalized(offsets, distances) * (speeds * ramps)[:, None]
+        desired[np.isnan(distances)] = 0.
+        return desired
+
+
+class FleeSystem(SteeringSystem):
+    """### FleeSystem ###
+
+  FleeAI agents run straight away from their threat at full speed while it is within radius,
+  and come to a stop once they are out of reach
+
+    """
+
+    behaviour = FleeAI
+    parameters = ('threat', 'radius')
+
+    def steer(self, positions, velocities, speeds, parameters):
+        offsets = positions - _lookup(parameters[:, 0].astype(np.int64), Position)
+        distances = np.linalg.norm(offsets, axis=1)
+        desired = _normalized(offsets, distances) * speeds[:, None]
+        desired[~(distances < parameters[:, 1])] = 0.
+        return desired
+
+
+class HostileSystem(SteeringSystem):
+    """### HostileSystem ###
+
+  HostileAI agents pursue their target while it is within range, aiming at where the target's
+  Velocity takes it by the time they could get there, looking at most prediction seconds ahead,
+  and come to a stop when it is out of range
+
+    >>> HostileSystem(fraction, lod, focus, prediction)
+
+    """
+
+    behaviour = HostileAI
+    parameters = ('target', 'range')
+
+    def __init__(self, fraction=1., lod=(), focus=None, prediction=1.):
+        super().__init__(fraction, lod, focus)
+        self.prediction = prediction
+
+    def steer(self, positions, velocities, speeds, parameters):
+        targets = parameters[:, 0].astype(np.int64)
+        offsets = _lookup(targets, Position) - positions
+        distances = np.linalg.norm(offsets, axis=1)
+        ahead = np.minimum(distances / np.where(speeds > 0, speeds, 1.), self.prediction)
+        offsets += np.nan_to_num(_lookup(targets, Velocity)) * ahead[:, None]
+        desired = _normalized(offsets) * speeds[:, None]
+        desired[~(distances < parameters[:, 1])] = 0.
+        return desired
+
+
+class AmbientSystem(SteeringSystem):
+    """### AmbientSystem ###
+
+  AmbientAI agents wander, each re-plan turns their heading by a random amount scaled by jitter
+
+    >>> AmbientSystem(fraction, lod, focus, axes, seed)
+        axes = scales the random turn per axis, (1, 0, 1) keeps agents wandering on the ground
+        seed = seed of the random generator
+
+    """
+
+    behaviour = AmbientAI
+    parameters = ('jitter',)
+
+    def __init__(self, fraction=1., lod=(), focus=None, axes=(1., 1., 1.), seed=None):
+        super().__init__(fraction, lod, focus)
+        self.axes = np.asarray(axes, np.float64)
+        self.random = np.random.default_rng(seed)
+
+    def steer(self, positions, velocities, speeds, parameters):
+        turns = self.random.standard_normal(velocities.shape) * self.axes * parameters[:, :1]
+        return _normalized(_normalized(velocities) + turns) * speeds[:, None]
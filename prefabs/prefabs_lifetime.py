@@ -0,0 +1,57 @@
+from core import System, TimerWheel
+from prefabs import Lifetime
+
+__doc__ = """### Prefabs Lifetime ###
+
+ script for expiring entities with a Lifetime, a Lifetime is scheduled on a timer wheel when it is
+ attached and cancelled when it is detached, each tick only the entities that expired are touched
+ instead of counting down every Lifetime in the world
+
+"""
+
+
+class LifetimeSystem(System):
+    """### LifetimeSystem ###
+
+  destroys entities once their Lifetime has run out, the destroys are recorded into the command buffer
+  so they happen at the end of the tick, setting Lifetime.time with set_value restarts the countdown
+
+    >>> LifetimeSystem(resolution)
+        resolution = seconds per timer tick, lifetimes are rounded up to whole ticks,
+        Lifetimes that are already attached are scheduled straight away
+    >>> timers
+        the TimerWheel, shared with Lifetime so attaching and detaching schedule and cancel
+    >>> remaining(entity_id)
+        seconds the entity has left, None if it has no Lifetime
+    >>> cancel(entity_ids)
+        stops the entities from expiring without detaching their Lifetime, returns how many were cancelled
+    >>> expired
+        the entity ids that expired in the last update
+
+  only one LifetimeSystem drives Lifetime at a time, the last one created
+
+    """
+
+    order = -100  # before anything spends time on entities that are about to go
+
+    def __init__(self, resolution=1. / 60.):
+        super().__init__(Lifetime, reads=(Lifetime,))
+        self.timers = TimerWheel(resolution)
+        self.expired = []
+        Lifetime.timers = self.timers
+        for entity_id, lifetime in self.query:
+            self.timers.schedule(entity_id, lifetime.time)
+
+    def process(self, rows):
+        self.expired = self.timers.advance(self.delta_time)
+        for entity_id in self.expired:
+            self.commands.destroy(entity_id)
+
+    def remaining(self, entity_id):
+        return self.timers.remaining(entity_id)
+
+    def cancel(self, entity_ids):
+        return self.timers.cancel_many(entity_ids)
+
+    def __len__(self):
+        return len(self.timers)
@@ -0,0 +1,293 @@
+import numpy as np
+
+from core import System, Column, CoreException
+from core.core_objects import storage
+from prefabs import Position
+from prefabs.prefabs_render import INSTANCE_FLOATS, RenderBatch
+
+__doc__ = """### Prefabs Particles ###
+
+ script for the particle engine, particles aren't entities, every emitter owns a fixed size pool of
+ arrays with a row per particle, spawning fills rows at the end of the pool, dead particles are
+ swapped out by the live ones at the end so the live rows stay packed at the front, and every step
+ is a handful of array operations over the live rows, nothing is allocated per particle
+
+"""
+
+
+class Curve:
+    """### Curve ###
+
+  a value over a particle's life, keys are (t, value) pairs with t from 0 at birth to 1 at death,
+  values are numbers or tuples, between keys values are interpolated linearly
+
+    >>> Curve([(0., (255, 255, 255)), (1., (255, 0, 0))])
+    >>> evaluate(t, out)
+        writes the value at each t into out, an (n, channels) array
+    >>> sample(resolution, scale)
+        returns a (resolution, channels) float32 table of the curve times scale at evenly spaced t,
+        emitters look particles up in it instead of interpolating every particle every frame
+
+    """
+    __slots__ = ('times', 'values')
+
+    def __init__(self, keys):
+        keys = sorted(keys, key=lambda key: key[0])
+        self.times = np.array([t for t, _ in keys], np.float64)
+        self.values = np.array([value for _, value in keys], np.float64).reshape(len(keys), -1)
+
+    @property
+    def channels(self):
+        return self.values.shape[1]
+
+    def evaluate(self, t, out):
+        for channel in range(self.channels):
+            out[:, channel] = np.interp(t, self.times, self.values[:, channel])
+        return out
+
+    def sample(self, resolution=256, scale=1.):
+        t = np.linspace(0., 1., resolution)
+        return (self.evaluate(t, np.empty((resolution, self.channels))) * scale).astype(np.float32)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(keys={len(self.times)}, channels={self.channels})"
+
+
+class ParticlePool:
+    """### ParticlePool ###
+
+  structure of arrays of up to capacity particles, rows [0, count) are the live particles
+
+    >>> ParticlePool(capacity, dtype)
+    >>> positions, velocities
+        (capacity, 3) arrays
+    >>> ages, lifetimes
+        (capacity,) arrays of seconds lived and seconds to live
+    >>> spawn(positions, velocities, lifetimes)
+        adds as many of the particles as there is room for, returns the number added
+    >>> step(delta_time, gravity, drag)
+        ages the particles, removes the dead and integrates the rest
+    >>> kill(dead)
+        removes the particles flagged in the boolean array dead of the live rows
+
+    """
+
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = capacity
+        self.count = 0
+        self.positions = np.zeros((capacity, 3), dtype)
+        self.velocities = np.zeros((capacity, 3), dtype)
+        self.ages = np.zeros(capacity, dtype)
+        self.lifetimes = np.zeros(capacity, dtype)
+        self.arrays = (self.positions, self.velocities, self.ages, self.lifetimes)
+
+    def spawn(self, positions, velocities, lifetimes):
+        count = min(len(positions), self.capacity - self.count)
+        rows = slice(self.count, self.count + count)
+        self.positions[rows] = positions[:count]
+        self.velocities[rows] = velocities[:count]
+        self.lifetimes[rows] = lifetimes[:count]
+        self.ages[rows] = 0.
+        self.count += count
+        return count
+
+    def kill(self, dead):
+        # swap remove in bulk, the holes left among the survivors are filled by the survivors past them
+        alive = self.count - int(np.count_nonzero(dead))
+        holes = np.flatnonzero(dead[:alive])
+        if len(holes):
+            movers = np.flatnonzero(~dead[alive:]) + alive
+            for array in self.arrays:
+                array[holes] = array[movers]
+        self.count = alive
+        return len(dead) - alive
+
+    def step(self, delta_time, gravity=None, drag=0.):
+        count = self.count
+        ages = self.ages[:count]
+        ages += delta_time
+        dead = ages >= self.lifetimes[:count]
+        if dead.any():
+            self.kill(dead)
+            count = self.count
+        velocities, positions = self.velocities[:count], self.positions[:count]
+        if gravity is not None:
+            velocities += gravity * delta_time
+        if drag:
+            velocities *= max(0., 1. - drag * delta_time)
+        positions += velocities * delta_time
+
+    def __len__(self):
+        return self.count
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(capacity={self.capacity})[count={self.count}]"
+
+
+class ParticleEmitter:
+    """### ParticleEmitter ###
+
+  spawns particles into its own pool and turns them into instance rows ready to draw
+
+    >>> ParticleEmitter(model, capacity, rate, lifetime, speed, direction, spread, radius, origin,
+    ...                 gravity, drag, colour, opacity, size, entity_id, seed)
+        model = mesh every particle is drawn with
+        capacity = most live particles, spawns past it are dropped
+        rate = particles spawned per second
+        lifetime, speed = (low, high) ranges picked from uniformly per particle, lifetimes must be above 0
+        direction, spread = particles leave within spread radians of direction
+        radius, origin = particles start within radius of origin
+        gravity, drag = acceleration and velocity damping per second
+        colour, opacity, size = Curves or constants over each particle's life, colour is 0 to 255,
+            they are sampled into tables of 256 steps when the emitter is made
+        entity_id = entity whose Position is used as origin, None to stay at origin
+
+    >>> burst(count)
+        spawns count particles at once, returns how many fit
+    >>> update(delta_time)
+        spawns rate particles, steps the pool and writes instances
+    >>> instances
+        (capacity, 20) float32 rows like RenderSystem's, a column major model matrix scaled by size
+        and translated to the particle followed by red, green, blue and alpha from 0 to 1
+    >>> batch()
+        a RenderBatch of the live instances, its colour is None as every instance has its own
+
+    """
+
+    def __init__(self, model='particle', capacity=10000, rate=0., lifetime=(1., 1.), speed=(1., 1.),
+                 direction=(0., 1., 0.), spread=0., radius=0., origin=(0., 0., 0.), gravity=(0., 0., 0.), drag=0.,
+                 colour=(255, 255, 255), opacity=1., size=1., entity_id=None, seed=None):
+        if min(lifetime) <= 0:
+            raise CoreException(self, "particle lifetimes must be above 0", lifetime=lifetime)
+        self.model = model
+        self.pool = ParticlePool(capacity)
+        self.rate = rate
+        self.lifetime = lifetime
+        self.speed = speed
+        self.spread = spread
+        self.radius = radius
+        self.origin = np.asarray(origin, np.float64)
+        self.gravity = np.asarray(gravity, np.float32) if any(gravity) else None
+        self.drag = drag
+        self.colour, self.opacity, self.size = (value if isinstance(value, Curve) else Curve([(0., value)])
+                                                for value in (colour, opacity, size))
+        # [size, red, green, blue, alpha] rows, a single gather gives every particle its values
+        self.table = np.hstack((self.size.sample(), self.colour.sample(scale=1. / 255.), self.opacity.sample()))
+        self.entity_id = entity_id
+        self.random = np.random.default_rng(seed)
+        self.owed = 0.
+        # directions are picked around +z and turned onto direction by this basis
+        forward = np.asarray(direction, np.float64)
+        forward = forward / np.linalg.norm(forward)
+        side = np.cross(forward, (1., 0., 0.) if abs(forward[0]) < .9 else (0., 1., 0.))
+        side /= np.linalg.norm(side)
+        self.basis = np.stack((side, np.cross(forward, side), forward))
+        self.instances = np.zeros((capacity, INSTANCE_FLOATS), np.float32)
+        self.instances[:, 15] = 1.
+        self.indices = np.zeros(capacity, np.intp)
+        self.looked_up = np.zeros((capacity, 5), np.float32)
+        self.owners = np.full(capacity, -1 if entity_id is None else entity_id, np.int64)
+
+    def _follow(self):
+        location = storage.locations.get(self.entity_id)
+        if location is None:
+            return
+        column = location[0].columns.get(Position)
+        if column is not None:
+            self.origin = (np.asarray(column.get(location[1]).get_value(), np.float64) if isinstance(column, Column)
+                           else column.array[location[1]].astype(np.float64))
+
+    def burst(self, count):
+        count = min(count, self.pool.capacity - self.pool.count)
+        if count <= 0:
+            return 0
+        uniform = self.random.random((count, 5))
+        # cone of directions, uniform over the spherical cap of spread radians
+        cos_spread = np.cos(self.spread)
+        z = 1. - uniform[:, 0] * (1. - cos_spread)
+        angle = uniform[:, 1] * 2. * np.pi
+        ring = np.sqrt(np.maximum(0., 1. - z * z))
+        directions = np.column_stack((ring * np.cos(angle), ring * np.sin(angle), z)) @ self.basis
+        low, high = self.speed
+        velocities = directions * (low + uniform[:, 2] * (high - low))[:, None]
+        positions = np.broadcast_to(self.origin, (count, 3))
+        if self.radius:
+            offsets = self.random.standard_normal((count, 3))
+            offsets *= (self.radius * np.cbrt(uniform[:, 3]) / np.linalg.norm(offsets, axis=1))[:, None]
+            positions = positions + offsets
+        low, high = self.lifetime
+        return self.pool.spawn(positions, velocities, low + uniform[:, 4] * (high - low))
+
+    def update(self, delta_time):
+        if self.entity_id is not None:
+            self._follow()
+        self.pool.step(delta_time, self.gravity, self.drag)
+        self.owed += self.rate * delta_time
+        if self.owed >= 1.:
+            spawning = int(self.owed)
+            self.owed -= spawning
+            self.burst(spawning)
+        self.write()
+
+    def write(self):
+        """fills the live instance rows from the pool"""
+        pool, count = self.pool, self.pool.count
+        instances, indices, looked_up = self.instances[:count], self.indices[:count], self.looked_up[:count]
+        # the row of the table each particle is at, from how far through its life it is
+        last = len(self.table) - 1
+        t = pool.ages[:count] / pool.lifetimes[:count]
+        t *= last
+        np.minimum(t, last, out=t)
+        indices[:] = t
+        np.take(self.table, indices, axis=0, out=looked_up)
+        size = looked_up[:, 0]
+        instances[:, 0] = instances[:, 5] = instances[:, 10] = size
+        instances[:, 12:15] = pool.positions[:count]
+        instances[:, 16:20] = looked_up[:, 1:]
+        return instances
+
+    def batch(self):
+        count = self.pool.count
+        return RenderBatch(self.model, None, float(self.opacity.values.min()), self.instances[:count],
+                           self.owners[:count])
+
+    def __len__(self):
+        return len(self.pool)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.model!r}, rate={self.rate})[particles={len(self)}]"
+
+
+class ParticleSystem(System):
+    """### ParticleSystem ###
+
+  updates every emitter it is given each tick, emitters that follow an entity read its Position
+
+    >>> ParticleSystem(*emitters)
+    >>> add(emitter) / remove(emitter)
+    >>> batches
+        a RenderBatch per emitter with live particles, from the last update
+
+    """
+
+    order = 90  # after things have moved, before RenderSystem
+
+    def __init__(self, *emitters):
+        super().__init__(Position, reads=(Position,))
+        self.emitters = list(emitters)
+        self.batches = []
+
+    def add(self, emitter):
+        self.emitters.append(emitter)
+        return emitter
+
+    def remove(self, emitter):
+        self.emitters.remove(emitter)
+
+    def process(self, rows):
+        for emitter in self.emitters:
+            emitter.update(self.delta_time)
+        self.batches = [emitter.batch() for emitter in self.emitters if len(emitter)]
+
+    def __len__(self):
+        return sum(len(emitter) for emitter in self.emitters)
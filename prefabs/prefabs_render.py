@@ -0,0 +1,203 @@
+import numpy as np
+
+from common.common_transforms import column_major, compose, quaternions_from_euler
+from core import System, Column
+from core.core_objects import storage
+from prefabs import Colour, Mesh, Opacity, Position, Rotation, Scale
+
+__doc__ = """### Prefabs Render ###
+
+ script for turning the world into instanced draw batches, every drawable entity owns a row of
+ packed float32 instance data that is only rewritten when one of its components changes, each frame
+ the rows are gathered into one reusable buffer in draw order and handed out as batch slices
+
+"""
+
+MATRIX, COLOUR = slice(0, 16), slice(16, 20)
+INSTANCE_FLOATS = 20
+
+
+def model_matrices(positions, rotations, scales):
+    """
+    :param positions: (n, 3) translations
+    :param rotations: (n, 3) euler angles in radians, applied x then y then z
+    :param scales: (n, 3) scale factors
+    :return: (n, 16) float32 model matrices, column major (translation in elements 12, 13, 14) as OpenGL expects
+    """
+    return column_major(compose(positions, quaternions_from_euler(rotations), scales))
+
+
+class RenderBatch:
+    """### RenderBatch ###
+
+  one instanced draw, every instance shares the mesh, colour and opacity of the batch
+
+    >>> model, colour, opacity, transparent
+        the mesh and material of the batch, transparent batches need blending,
+        colour is None for batches whose instances each have their own, like particles
+    >>> instances
+        (count, 20) float32 slice of the system's buffer, 16 floats of column major model matrix
+        followed by red, green, blue and alpha from 0 to 1
+    >>> entity_ids
+        the entity of each instance
+
+    """
+    __slots__ = ('model', 'colour', 'opacity', 'transparent', 'instances', 'entity_ids')
+
+    def __init__(self, model, colour, opacity, instances, entity_ids):
+        self.model = model
+        self.colour = colour
+        self.opacity = opacity
+        self.transparent = opacity < 1.
+        self.instances = instances
+        self.entity_ids = entity_ids
+
+    def __len__(self):
+        return len(self.instances)
+
+    def __str__(self):
+        return f"{self.__class__.__name__}({self.model!r}, colour={self.colour}, opacity={self.opacity})" \
+               f"[instances={len(self)}]"
+
+
+class RenderSystem(System):
+    """### RenderSystem ###
+
+  builds RenderBatches from every entity with a Mesh and a Position, Rotation, Scale, Colour and Opacity
+  are optional, entities are grouped by Mesh.model, Colour and Opacity, opaque batches come first and
+  transparent instances are sorted back to front from camera, then split into batches where the group changes
+
+    >>> RenderSystem(camera)
+        camera = position transparent instances are sorted away from
+    >>> batches
+        the RenderBatches of the last update in draw order, their instances point into buffer
+    >>> buffer
+        the reusable (capacity, 20) float32 array every batch is a slice of
+
+  only entities with a changed, added or removed component are recomputed, the rest of the frame is
+  a single gather of the instance rows into draw order
+
+    """
+
+    order = 100  # after the systems that move things
+    tracked = (Mesh, Position, Rotation, Scale, Colour, Opacity)
+
+    def __init__(self, camera=(0., 0., 0.)):
+        super().__init__(Mesh, Position, optional=(Rotation, Scale, Colour, Opacity), reads=self.tracked)
+        self.camera = np.asarray(camera, np.float64)
+        self.slots = {}
+        self.entity_ids = np.zeros(64, np.int64)
+        self.instances = np.zeros((64, INSTANCE_FLOATS), np.float32)
+        self.centres = np.zeros((64, 3), np.float64)
+        self.groups = np.zeros(64, np.int64)
+        # {(model, colour, opacity): group id} and the reverse
+        self.group_ids = {}
+        self.group_keys = []
+        self.buffer = np.zeros((64, INSTANCE_FLOATS), np.float32)
+        self.batches = []
+
+    def __len__(self):
+        return len(self.slots)
+
+    def group(self, key):
+        group = self.group_ids.get(key)
+        if group is None:
+            group = self.group_ids[key] = len(self.group_keys)
+            self.group_keys.append(key)
+        return group
+
+    def _grow(self, count):
+        capacity = max(len(self.entity_ids) * 2, count)
+        for name in ('entity_ids', 'instances', 'centres', 'groups'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _remove(self, entity_id):
+        slot = self.slots.pop(entity_id, None)
+        if slot is None:
+            return
+        last = len(self.slots)
+        if slot != last:
+            moved = int(self.entity_ids[last])
+            for array in (self.entity_ids, self.instances, self.centres, self.groups):
+                array[slot] = array[last]
+            self.slots[moved] = slot
+
+    @staticmethod
+    def _values(column, rows, fields, default):
+        # (len(rows), fields) float array of a column, default for tables without the column
+        if column is None:
+            return np.tile(np.asarray(default, np.float64), (len(rows), 1))
+        if not isinstance(column, Column):
+            return column.array[rows].astype(np.float64)
+        components = [column.get(row) for row in rows]
+        return np.array([[getattr(component, name) for name in fields] for component in components], np.float64)
+
+    def _update(self, table, rows):
+        columns = table.columns
+        rows = np.asarray(rows, np.int64)
+        positions = self._values(columns[Position], rows, 'xyz', (0., 0., 0.))
+        rotations = self._values(columns.get(Rotation), rows, 'xyz', (0., 0., 0.))
+        meshes = [columns[Mesh].get(row).model for row in rows.tolist()]
+        scale, colour, opacity = columns.get(Scale), columns.get(Colour), columns.get(Opacity)
+        scales = np.array([(tuple(scale.get(row).scale) or (1., 1., 1.)) if scale is not None else (1., 1., 1.)
+                           for row in rows.tolist()], np.float64)
+        colours = [tuple(colour.get(row).colour) if colour is not None else (255, 255, 255) for row in rows.tolist()]
+        alphas = [float(opacity.get(row).opacity) if opacity is not None else 1. for row in rows.tolist()]
+        entity_ids = np.asarray(table.entities, np.int64)[rows].tolist()
+        slots = []
+        for entity_id in entity_ids:
+            slot = self.slots.get(entity_id)
+            if slot is None:
+                slot = self.slots[entity_id] = len(self.slots)
+                if slot == len(self.entity_ids):
+                    self._grow(slot + 1)
+                self.entity_ids[slot] = entity_id
+            slots.append(slot)
+        self.instances[slots, MATRIX] = model_matrices(positions, rotations, scales)
+        self.instances[slots, COLOUR] = np.column_stack((np.array(colours, np.float32).reshape(-1, 3) / 255., alphas))
+        self.centres[slots] = positions
+        self.groups[slots] = [self.group((mesh, c, a)) for mesh, c, a in zip(meshes, colours, alphas)]
+
+    def process(self, rows):
+        since = self.since
+        # entities that lost a tracked component are removed or recomputed without it
+        dirty = {entity_id for t in self.tracked for entity_id in storage.removed_since(t, since)}
+        for entity_id in dirty:
+            if not self.query.accepts(storage.mask_of(entity_id)):
+                self._remove(entity_id)
+        dirty = [entity_id for entity_id in dirty if entity_id in self.slots]
+        for table in rows.tables():
+            changed = [table.columns[t].changed_since(since) for t in self.tracked if t in table.columns]
+            changed = np.unique(np.concatenate([np.asarray(changed_rows, np.int64) for changed_rows in changed]))
+            if len(changed):
+                self._update(table, changed)
+        for entity_id in dirty:
+            table, row = storage.locations[entity_id]
+            self._update(table, [row])
+        self.build()
+
+    def build(self):
+        """gathers the instance rows into buffer in draw order and rebuilds batches"""
+        count = len(self.slots)
+        groups, alphas = self.groups[:count], self.instances[:count, 19]
+        transparent = alphas < 1.
+        opaque = np.flatnonzero(~transparent)
+        opaque = opaque[np.argsort(groups[opaque], kind='stable')]
+        blended = np.flatnonzero(transparent)
+        offsets = self.centres[blended] - self.camera
+        blended = blended[np.argsort(-np.einsum('ij,ij->i', offsets, offsets), kind='stable')]
+        order = np.concatenate((opaque, blended))
+        if count > len(self.buffer):
+            self.buffer = np.zeros((max(count, len(self.buffer) * 2), INSTANCE_FLOATS), np.float32)
+        np.take(self.instances[:count], order, axis=0, out=self.buffer[:count])
+        # a batch ends wherever the group changes, for transparent instances that follows depth order
+        ordered = groups[order]
+        starts = np.flatnonzero(np.diff(ordered, prepend=-1)) if count else np.zeros(0, np.int64)
+        ends = np.append(starts[1:], count)
+        entity_ids = self.entity_ids[order]
+        self.batches = [RenderBatch(*self.group_keys[ordered[start]], self.buffer[start:end], entity_ids[start:end])
+                        for start, end in zip(starts.tolist(), ends.tolist())]
+        return self.batches
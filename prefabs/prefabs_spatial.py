@@ -0,0 +1,341 @@
+import heapq
+from itertools import product
+
+import numpy as np
+
+from core import System, Column
+from core.core_objects import storage
+from prefabs import Position
+
+__doc__ = """### Prefabs Spatial ###
+
+ script for spatial indexes over Position, a uniform hash grid for things that move, kept up to date
+ from the Positions that changed each tick, and a static k-d tree for things that don't,
+ both answer radius, k nearest and axis aligned box queries for one point or a batch of them
+
+"""
+
+
+def _batch(points, single):
+    # queries take one point or an (n, 3) batch, a batch gets a list with a result per point
+    points = np.asarray(points, np.float64)
+    if points.ndim == 1:
+        return single(points)
+    return [single(point) for point in points]
+
+
+class SpatialGrid:
+    """### SpatialGrid ###
+
+  uniform hash grid of entity positions, each cell_size sided cell keeps the ids of the entities
+  inside it, updating only touches entities that moved to another cell
+
+    >>> SpatialGrid(cell_size)
+        cell_size = side of a cell, about the radius most queries use works best
+
+    >>> update(entity_ids, positions)
+        inserts or moves entities, positions is an (n, 3) array
+    >>> remove(entity_ids)
+        removes entities from the grid
+    >>> radius(points, radius)
+        returns an array of the ids within radius of a point, or a list of them for a batch of points
+    >>> nearest(points, k)
+        returns (ids, distances) of the k nearest entities, closest first, or a list of them for a batch
+    >>> aabb(lows, highs)
+        returns an array of the ids inside the box from low to high, or a list of them for a batch of boxes
+    >>> position(entity_id)
+        returns the position the grid has for the entity
+
+    """
+
+    def __init__(self, cell_size=1.):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.slots = {}
+        self.ids = np.zeros(0, np.int64)
+        self.points = np.zeros((0, 3), np.float64)
+        self.keys = np.zeros((0, 3), np.int64)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, entity_id):
+        return entity_id in self.slots
+
+    def _grow(self, count):
+        capacity = max(len(self.ids) * 2, count, 64)
+        for name in ('ids', 'points', 'keys'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def update(self, entity_ids, positions):
+        positions = np.asarray(positions, np.float64).reshape(-1, 3)
+        keys = np.floor(positions / self.cell_size).astype(np.int64)
+        entity_ids = np.asarray(entity_ids, np.int64).tolist()
+        slots, cells = self.slots, self.cells
+        found = np.array([slots.get(entity_id, -1) for entity_id in entity_ids], np.int64)
+        known = found >= 0
+        moved = np.zeros(len(found), bool)
+        moved[known] = (self.keys[found[known]] != keys[known]).any(axis=1)
+        self.points[found[known]] = positions[known]
+        for index in np.flatnonzero(moved).tolist():
+            slot, entity_id = found[index], entity_ids[index]
+            old = tuple(self.keys[slot].tolist())
+            cells[old].discard(entity_id)
+            if not cells[old]:
+                del cells[old]
+            key = self.keys[slot] = keys[index]
+            cells.setdefault(tuple(key.tolist()), set()).add(entity_id)
+        new = np.flatnonzero(~known)
+        if len(new) and len(slots) + len(new) > len(self.ids):
+            self._grow(len(slots) + len(new))
+        for index in new.tolist():
+            entity_id = entity_ids[index]
+            if entity_id in slots:  # listed twice in one update
+                continue
+            slot = slots[entity_id] = len(slots)
+            self.ids[slot], self.points[slot], self.keys[slot] = entity_id, positions[index], keys[index]
+            cells.setdefault(tuple(keys[index].tolist()), set()).add(entity_id)
+
+    def remove(self, entity_ids):
+        slots, cells = self.slots, self.cells
+        for entity_id in np.asarray(entity_ids, np.int64).tolist():
+            slot = slots.pop(entity_id, None)
+            if slot is None:
+                continue
+            key = tuple(self.keys[slot].tolist())
+            cells[key].discard(entity_id)
+            if not cells[key]:
+                del cells[key]
+            last = len(slots)
+            if slot != last:
+                moved = int(self.ids[last])
+                self.ids[slot], self.points[slot], self.keys[slot] = moved, self.points[last], self.keys[last]
+                slots[moved] = slot
+
+    def position(self, entity_id):
+        return self.points[self.slots[entity_id]].copy()
+
+    def _candidates(self, low, high):
+        # slots of the entities in every cell overlapping the box, walks the occupied cells instead
+        # when the box covers more cells than are occupied
+        low = np.floor(low / self.cell_size).astype(np.int64).tolist()
+        high = np.floor(high / self.cell_size).astype(np.int64).tolist()
+        cells, slots = self.cells, self.slots
+        if np.prod([h - l + 1 for l, h in zip(low, high)], dtype=float) > len(cells):
+            keys = [key for key in cells if all(l <= k <= h for k, l, h in zip(key, low, high))]
+        else:
+            keys = [key for key in product(*(range(l, h + 1) for l, h in zip(low, high))) if key in cells]
+        return np.fromiter((slots[entity_id] for key in keys for entity_id in cells[key]), np.int64)
+
+    def _radius(self, point, radius):
+        candidates = self._candidates(point - radius, point + radius)
+        offsets = self.points[candidates] - point
+        return self.ids[candidates[np.einsum('ij,ij->i', offsets, offsets) <= radius * radius]]
+
+    def radius(self, points, radius):
+        return _batch(points, lambda point: self._radius(point, radius))
+
+    def _nearest(self, point, k):
+        # grows a radius search until it holds k entities, everything outside it is further than all of them
+        k = min(k, len(self))
+        if not k:
+            return np.zeros(0, np.int64), np.zeros(0)
+        radius = self.cell_size
+        while True:
+            candidates = self._candidates(point - radius, point + radius)
+            distances = np.sqrt(((self.points[candidates] - point) ** 2).sum(axis=1))
+            inside = distances <= radius
+            enough = np.count_nonzero(inside) >= k
+            if enough or len(candidates) == len(self):
+                if enough:
+                    candidates, distances = candidates[inside], distances[inside]
+                order = np.argsort(distances, kind='stable')[:k]
+                return self.ids[candidates[order]], distances[order]
+            radius *= 2
+
+    def nearest(self, points, k=1):
+        return _batch(points, lambda point: self._nearest(point, k))
+
+    def _aabb(self, low, high):
+        candidates = self._candidates(low, high)
+        points = self.points[candidates]
+        return self.ids[candidates[((points >= low) & (points <= high)).all(axis=1)]]
+
+    def aabb(self, lows, highs):
+        lows, highs = np.asarray(lows, np.float64), np.asarray(highs, np.float64)
+        if lows.ndim == 1:
+            return self._aabb(lows, highs)
+        return [self._aabb(low, high) for low, high in zip(lows, highs)]
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(cell_size={self.cell_size})[entities={len(self)}, cells={len(self.cells)}]"
+
+
+class KDTree:
+    """### KDTree ###
+
+  static k-d tree over a set of points, built once and queried many times, for level geometry,
+  props and anything else that doesn't move, rebuild it when the set changes
+
+    >>> KDTree(points, ids, leaf_size)
+        points = (n, 3) array of positions
+        ids = (n,) array of the entity ids of the points, defaults to 0 to n - 1
+        leaf_size = the most points kept in a leaf, leaves are tested in one vectorized step
+
+    >>> radius(points, radius) / nearest(points, k) / aabb(lows, highs)
+        the same queries as SpatialGrid
+
+    """
+
+    def __init__(self, points, ids=None, leaf_size=16):
+        points = np.asarray(points, np.float64).reshape(-1, 3)
+        self.ids = np.arange(len(points), dtype=np.int64) if ids is None else np.asarray(ids, np.int64)
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(points))
+        # nodes are stored in flat lists, a node is a leaf when its left child is -1
+        self.lows, self.highs, self.starts, self.ends, self.lefts, self.rights = [], [], [], [], [], []
+        self.points = points
+        if len(points):
+            self._build(0, len(points))
+        self.points = points[self.order]
+        self.ids = self.ids[self.order]
+        self.lows, self.highs = np.array(self.lows), np.array(self.highs)
+
+    def _build(self, start, end):
+        node = len(self.starts)
+        points = self.points[self.order[start:end]]
+        low, high = points.min(axis=0), points.max(axis=0)
+        self.lows.append(low)
+        self.highs.append(high)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lefts.append(-1)
+        self.rights.append(-1)
+        if end - start > self.leaf_size:
+            axis = int(np.argmax(high - low))
+            middle = (end - start) // 2
+            split = np.argpartition(points[:, axis], middle)
+            self.order[start:end] = self.order[start:end][split]
+            self.lefts[node] = self._build(start, start + middle)
+            self.rights[node] = self._build(start + middle, end)
+        return node
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _box_distance(self, node, point):
+        # squared distance from point to the box of node, 0 inside the box
+        gap = np.maximum(np.maximum(self.lows[node] - point, point - self.highs[node]), 0.)
+        return float(gap @ gap)
+
+    def _radius(self, point, radius):
+        found, stack, limit = [], [0] if len(self) else [], radius * radius
+        while stack:
+            node = stack.pop()
+            if self._box_distance(node, point) > limit:
+                continue
+            if self.lefts[node] < 0:
+                start, end = self.starts[node], self.ends[node]
+                offsets = self.points[start:end] - point
+                found.append(self.ids[start:end][np.einsum('ij,ij->i', offsets, offsets) <= limit])
+            else:
+                stack += (self.lefts[node], self.rights[node])
+        return np.concatenate(found) if found else np.zeros(0, np.int64)
+
+    def radius(self, points, radius):
+        return _batch(points, lambda point: self._radius(point, radius))
+
+    def _nearest(self, point, k):
+        # best first search, nodes are visited closest box first and the k best are kept in a max heap
+        best = []
+        queue = [(0., 0)] if len(self) else []
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if len(best) == k and distance > -best[0][0]:
+                break
+            if self.lefts[node] < 0:
+                start, end = self.starts[node], self.ends[node]
+                offsets = self.points[start:end] - point
+                for index, squared in zip(range(start, end), np.einsum('ij,ij->i', offsets, offsets).tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-squared, index))
+                    elif squared < -best[0][0]:
+                        heapq.heapreplace(best, (-squared, index))
+            else:
+                for child in (self.lefts[node], self.rights[node]):
+                    heapq.heappush(queue, (self._box_distance(child, point), child))
+        best.sort(reverse=True)
+        indexes = np.array([index for _, index in best], np.int64)
+        return self.ids[indexes], np.sqrt([-squared for squared, _ in best])
+
+    def nearest(self, points, k=1):
+        return _batch(points, lambda point: self._nearest(point, k))
+
+    def _aabb(self, low, high):
+        found, stack = [], [0] if len(self) else []
+        while stack:
+            node = stack.pop()
+            node_low, node_high = self.lows[node], self.highs[node]
+            if (node_low > high).any() or (node_high < low).any():
+                continue
+            start, end = self.starts[node], self.ends[node]
+            if (node_low >= low).all() and (node_high <= high).all():
+                found.append(self.ids[start:end])
+            elif self.lefts[node] < 0:
+                points = self.points[start:end]
+                found.append(self.ids[start:end][((points >= low) & (points <= high)).all(axis=1)])
+            else:
+                stack += (self.lefts[node], self.rights[node])
+        return np.concatenate(found) if found else np.zeros(0, np.int64)
+
+    def aabb(self, lows, highs):
+        lows, highs = np.asarray(lows, np.float64), np.asarray(highs, np.float64)
+        if lows.ndim == 1:
+            return self._aabb(lows, highs)
+        return [self._aabb(low, high) for low, high in zip(lows, highs)]
+
+    def __str__(self):
+        return f"{self.__class__.__name__}(leaf_size={self.leaf_size})[points={len(self)}, nodes={len(self.starts)}]"
+
+
+class SpatialIndexSystem(System):
+    """### SpatialIndexSystem ###
+
+  keeps a SpatialGrid of every entity with a Position, each update only the Positions that changed
+  or were added since the last update are written to the grid and entities that lost their Position
+  are removed, run it before the systems that query the grid
+
+    >>> SpatialIndexSystem(cell_size)
+    >>> grid
+        the SpatialGrid, query it with grid.radius, grid.nearest and grid.aabb
+    >>> static_tree(entity_ids)
+        builds a KDTree of the current positions of the given entities, or of every indexed entity
+
+    """
+
+    def __init__(self, cell_size=1.):
+        super().__init__(Position, changed=(Position,), reads=(Position,))
+        self.grid = SpatialGrid(cell_size)
+
+    def process(self, rows):
+        removed = storage.removed_since(Position, self.since)
+        if removed:
+            self.grid.remove(removed)
+        for table, selected in rows.tables():
+            column = table.columns[Position]
+            entity_ids = np.asarray(table.entities, np.int64)[selected]
+            if isinstance(column, Column):
+                positions = [(p.x, p.y, p.z) for p in map(column.get, selected)]
+            else:
+                positions = column.array[selected]
+            self.grid.update(entity_ids, positions)
+
+    def static_tree(self, entity_ids=None, leaf_size=16):
+        grid = self.grid
+        if entity_ids is None:
+            return KDTree(grid.points[:len(grid)], grid.ids[:len(grid)], leaf_size)
+        entity_ids = list(entity_ids)
+        return KDTree([grid.position(entity_id) for entity_id in entity_ids], entity_ids, leaf_size)